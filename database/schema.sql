@@ -129,4 +129,20 @@ CREATE TABLE champions_league_standings (
     goals_against INT,
     goal_difference INT,
     PRIMARY KEY (position, team_id)
-);
\ No newline at end of file
+);
+
+-- Ledger of load throughput, one row per table per run; kept across schema reloads
+CREATE TABLE IF NOT EXISTS pipeline_runs (
+    run_id UUID,
+    table_name TEXT,
+    loaded_at TIMESTAMPTZ DEFAULT now(),
+    load_mode TEXT,
+    copy_format TEXT,
+    load_workers INT,
+    rows BIGINT,
+    bytes BIGINT,
+    copy_seconds DOUBLE PRECISION,
+    rows_per_second DOUBLE PRECISION,
+    lock_wait_seconds DOUBLE PRECISION,
+    PRIMARY KEY (run_id, table_name)
+);
@@ -0,0 +1,35 @@
+"""Process-wide boto3 clients shared by every stage of the pipeline."""
+
+import threading
+from os import environ as ENV
+import boto3
+from botocore.config import Config
+
+_s3_client = None
+_lock = threading.Lock()
+
+
+def get_s3_client():
+    """Return the shared S3 client, creating it on first use.
+
+    boto3 clients are thread-safe, so one client and its connection pool
+    (S3_MAX_POOL_CONNECTIONS, default 20) serve every S3 read and write in
+    the process, and are reused across warm Lambda invocations.
+    """
+    global _s3_client
+    with _lock:
+        if _s3_client is None:
+            _s3_client = boto3.client(
+                service_name="s3",
+                aws_access_key_id=ENV["AWS_ACCESS_KEY"],
+                aws_secret_access_key=ENV["AWS_SECRET_KEY"],
+                config=Config(max_pool_connections=int(ENV.get('S3_MAX_POOL_CONNECTIONS', 20)))
+            )
+        return _s3_client
+
+
+def reset_s3_client():
+    """Drop the shared S3 client so the next get_s3_client call builds a new one."""
+    global _s3_client
+    with _lock:
+        _s3_client = None
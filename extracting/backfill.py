@@ -0,0 +1,115 @@
+"""Backfills past seasons of team matches in date windows, resuming from a checkpoint."""
+
+import argparse
+import json
+import os
+import threading
+from datetime import date, timedelta
+from os import environ as ENV
+from dotenv import load_dotenv
+
+from extract_data import extract_endpoints, ingest_data, ingest_data_to_s3
+from job_spec import load_job_spec
+
+BACKFILL_DIR = "backfill"
+
+
+def season_windows(season, window_days=30):
+    """Split season (the year it starts) into consecutive (dateFrom, dateTo) windows.
+
+    A season is taken to run from 1 July to 30 June of the following year.
+    """
+    start = date(season, 7, 1)
+    end = date(season + 1, 6, 30)
+    windows = []
+    while start <= end:
+        stop = min(start + timedelta(days=window_days - 1), end)
+        windows.append((start.isoformat(), stop.isoformat()))
+        start = stop + timedelta(days=1)
+    return windows
+
+
+def backfill_jobs(spec, seasons, window_days=30):
+    """Return the (api_name, file_name) pairs covering every team's matches in seasons."""
+    jobs = []
+    for team in spec.get('teams', []):
+        for season in seasons:
+            for date_from, date_to in season_windows(season, window_days):
+                api_name = 'v4/teams/{}/matches/?season={}&dateFrom={}&dateTo={}'.format(
+                    team['id'], season, date_from, date_to)
+                f_name = '{}/{}Matches_{}_{}_{}.json'.format(
+                    BACKFILL_DIR, team['name'], season, date_from, date_to)
+                jobs.append((api_name, f_name))
+    return jobs
+
+
+class Checkpoint:
+    """The set of windows already fetched, saved to a JSON file after each one completes."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, mode='r', encoding='utf-8') as f:
+                self.done = set(json.load(f))
+
+    def mark_done(self, f_name):
+        with self.lock:
+            self.done.add(f_name)
+            part_name = self.path + '.part'
+            with open(part_name, mode='w', encoding='utf-8') as f:
+                json.dump(sorted(self.done), f)
+            os.replace(part_name, self.path)
+
+    def checkpointed(self, ingest, prefix=''):
+        """Wrap ingest so every successful fetch is recorded, under its name without prefix."""
+        def run(url, key, target, api_name, f_name):
+            result = ingest(url, key, target, api_name, f_name)
+            self.mark_done(f_name[len(prefix):] if f_name.startswith(prefix) else f_name)
+            return result
+        return run
+
+
+def run_backfill(seasons, target, checkpoint_path, window_days=30, bucket=False, max_workers=None):
+    """Fetch every outstanding window of seasons into target (a directory, or a bucket if bucket).
+
+    Requests share the process-wide rate limiter. Windows recorded in the
+    checkpoint are skipped, so an interrupted backfill resumes where it stopped.
+    """
+    base_url = ENV['API_URL']
+    api_key = ENV['API_KEY']
+    checkpoint = Checkpoint(checkpoint_path)
+    jobs = backfill_jobs(load_job_spec(), seasons, window_days)
+    pending = [(api_name, f_name) for api_name, f_name in jobs if f_name not in checkpoint.done]
+    print("Backfill: {} of {} windows left to fetch".format(len(pending), len(jobs)))
+    if not pending:
+        return {}
+
+    # S3 keys carry the json_files/ prefix; the checkpoint keeps the bare names it is filtered by
+    prefix = "json_files/" if bucket else ''
+    if bucket:
+        pending = [(api_name, prefix + f_name) for api_name, f_name in pending]
+        ingest = ingest_data_to_s3
+    else:
+        os.makedirs(os.path.join(target, BACKFILL_DIR), exist_ok=True)
+        ingest = ingest_data
+    return extract_endpoints(checkpoint.checkpointed(ingest, prefix), base_url, api_key, target, pending,
+                             max_workers=max_workers)
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    json_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "json_files")
+
+    parser = argparse.ArgumentParser(description="Backfill past seasons of match data.")
+    parser.add_argument('seasons', nargs='+', type=int, help="seasons to fetch, by starting year")
+    parser.add_argument('--window-days', type=int, default=30, help="days covered by each request")
+    parser.add_argument('--workers', type=int, default=None, help="concurrent requests (default EXTRACT_WORKERS)")
+    parser.add_argument('--s3', action='store_true', help="upload to BUCKET_NAME instead of json_files/")
+    parser.add_argument('--checkpoint', default=os.path.join(json_path, BACKFILL_DIR + '.checkpoint.json'),
+                        help="file recording completed windows")
+    args = parser.parse_args()
+
+    run_backfill(args.seasons, ENV['BUCKET_NAME'] if args.s3 else json_path, args.checkpoint,
+                 window_days=args.window_days, bucket=args.s3, max_workers=args.workers)
@@ -0,0 +1,104 @@
+"""Typed Parquet output for the parse stage, as an alternative to CSV.
+
+Selected with PARSE_OUTPUT_FORMAT=parquet. Columns are typed from table_schemas
+(INT -> int32, BIGINT -> int64, DATE -> date32, TEXT -> string), so the files
+are smaller and keep their types. The loader still has to turn them into COPY
+data: CSV text by default, or binary rows with COPY_FORMAT=binary. pyarrow is
+only imported when the Parquet format is actually used.
+"""
+
+import os
+from datetime import date
+from io import BytesIO, StringIO
+from os import environ as ENV
+
+from table_schemas import COLUMNS, table_for_file
+
+FORMATS = ('csv', 'parquet')
+
+
+def output_format():
+    """Return the configured parse output format, 'csv' (default) or 'parquet'."""
+    fmt = ENV.get('PARSE_OUTPUT_FORMAT', 'csv').lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"PARSE_OUTPUT_FORMAT must be one of {FORMATS}, got {fmt!r}")
+    return fmt
+
+
+def output_name(file_name, fmt=None):
+    """Return file_name (e.g. 'ChelseaMatches.csv') with the extension of fmt."""
+    fmt = fmt or output_format()
+    return file_name.rsplit('.', 1)[0] + '.' + fmt
+
+
+def _to_date(value):
+    # API dates come as '2024-08-18' or '2024-08-18T15:30:00Z'; the tables keep the day
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+CONVERTERS = {'INT': int, 'BIGINT': int, 'DATE': _to_date, 'TEXT': str}
+
+
+def to_arrow(file_name, col_names, rows):
+    """Build a typed pyarrow Table for file_name's table from parsed rows (dicts or sequences)."""
+    import pyarrow as pa
+
+    arrow_types = {'INT': pa.int32(), 'BIGINT': pa.int64(), 'DATE': pa.date32(), 'TEXT': pa.string()}
+    table = table_for_file(file_name)
+    columns = COLUMNS[table]
+    if len(columns) != len(col_names):
+        raise ValueError(f"{file_name} has {len(col_names)} columns, {table} expects {len(columns)}")
+
+    values = [[] for _ in columns]
+    for row in rows:
+        if isinstance(row, dict):
+            row = [row.get(name) for name in col_names]
+        for column, value in zip(values, row):
+            column.append(value)
+
+    arrays, fields = [], []
+    for (name, pg_type), column in zip(columns, values):
+        convert = CONVERTERS[pg_type]
+        arrays.append(pa.array([None if v is None or v == '' else convert(v) for v in column],
+                               type=arrow_types[pg_type]))
+        fields.append(pa.field(name, arrow_types[pg_type]))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def parquet_bytes(file_name, col_names, rows):
+    """Return the rows encoded as a Parquet file, for uploading to S3."""
+    import pyarrow.parquet as pq
+
+    buffer = BytesIO()
+    pq.write_table(to_arrow(file_name, col_names, rows), buffer, compression='zstd')
+    return buffer.getvalue()
+
+
+def write_parquet(file_name, writePath, col_names, row_data):
+    """Parquet counterpart of helperFunction.writeData2CSV; file_name may end in .csv or .parquet."""
+    import pyarrow.parquet as pq
+
+    out_name = output_name(file_name, 'parquet')
+    # Rows are all read before the file is opened, so a failing row stream leaves the last good file
+    table = to_arrow(file_name, col_names, row_data)
+    with open(os.path.join(writePath, out_name), 'wb') as f:
+        pq.write_table(table, f, compression='zstd')
+    print("Data written to", out_name)
+
+
+def read_parquet(source):
+    """Read a Parquet file from a path or bytes into a pyarrow Table."""
+    import pyarrow.parquet as pq
+
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    return pq.read_table(source)
+
+
+def arrow_to_csv(table):
+    """Return table as headerless CSV text, for COPY ... WITH (FORMAT csv); nulls are unquoted empties."""
+    import pyarrow.csv as pacsv
+
+    buffer = BytesIO()
+    pacsv.write_csv(table, buffer, pacsv.WriteOptions(include_header=False))
+    return StringIO(buffer.getvalue().decode('utf-8'))
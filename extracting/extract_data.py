@@ -1,84 +1,224 @@
-from helperFunction import wrappedRequest
+from helperFunction import wrappedRequest, runConcurrently
+from job_spec import load_job_spec, expand_jobs
+from aws_clients import get_s3_client
+from raw_storage import CONTENT_TYPES, candidate_names, compressing_writer, find_raw_object, raw_compression, stored_name
 from dotenv import load_dotenv
 from os import environ as ENV
 import os
 import json
-import boto3
-from io import StringIO
+import hashlib
+import tempfile
 
+# Per-endpoint ETag / Last-Modified / content hash, kept next to the JSON files
+VALIDATORS_FILE = ".validators.json"
 
-def ingest_data(url, key, path, api_name, f_name):
+# Bytes read from the response per chunk when streaming to disk or S3
+CHUNK_SIZE = 64 * 1024
+# Payloads up to this size are spooled in memory before an S3 upload, larger ones in /tmp
+SPOOL_SIZE = 8 * 1024 * 1024
+
+
+def load_validators(path):
+    """Return the stored validators for the JSON files in path, or {} if none."""
+    file_name = os.path.join(path, VALIDATORS_FILE)
+    if not os.path.exists(file_name):
+        return {}
+    with open(file_name, mode='r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_validators(validators, path):
+    """Write validators next to the JSON files in path."""
+    with open(os.path.join(path, VALIDATORS_FILE), mode='w', encoding='utf-8') as f:
+        json.dump(validators, f)
+
+
+def load_validators_s3(bucket_name, s3_key="json_files/" + VALIDATORS_FILE):
+    """Return the validators stored in the bucket, or {} if none."""
+    s3_client = get_s3_client()
+    try:
+        response = s3_client.get_object(Bucket=bucket_name, Key=s3_key)
+    except s3_client.exceptions.NoSuchKey:
+        return {}
+    return json.loads(response['Body'].read().decode('utf-8'))
+
+
+def save_validators_s3(validators, bucket_name, s3_key="json_files/" + VALIDATORS_FILE):
+    """Write validators to the bucket."""
+    get_s3_client().put_object(Bucket=bucket_name, Key=s3_key,
+                               Body=json.dumps(validators), ContentType='application/json')
+
+
+def conditional_headers(validators, name):
+    """Build If-None-Match / If-Modified-Since headers from the validators stored for name."""
+    entry = validators.get(name, {})
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def record_validators(validators, name, r, digest):
+    """Store the validators of response r under name and return whether the payload changed.
+
+    digest is the sha256 of the body. A 304 response, or a 200 whose body hashes
+    the same as last time, counts as unchanged.
+    """
+    if r.status_code == 304:
+        return False
+    previous = validators.get(name, {})
+    validators[name] = {
+        'etag': r.headers.get('ETag'),
+        'last_modified': r.headers.get('Last-Modified'),
+        'sha256': digest,
+    }
+    return previous.get('sha256') != digest
+
+
+def stream_response(r, f, chunk_size=CHUNK_SIZE):
+    """Copy the body of streamed response r into binary file f and return its sha256.
+
+    The bytes are written as received, without decoding the JSON. The only checks
+    are a 200 status and a body that starts and ends like a JSON document.
+    """
+    if r.status_code != 200:
+        raise ValueError("Unexpected response code {} from {}".format(r.status_code, r.url))
+    digest = hashlib.sha256()
+    first = last = b''
+    for chunk in r.iter_content(chunk_size=chunk_size):
+        if not chunk:
+            continue
+        if not first:
+            first = chunk.lstrip()[:1]
+        stripped = chunk.rstrip()
+        if stripped:
+            last = stripped[-1:]
+        digest.update(chunk)
+        f.write(chunk)
+    if first not in (b'{', b'[') or last not in (b'}', b']'):
+        raise ValueError("Response from {} is not a JSON document".format(r.url))
+    return digest.hexdigest()
+
+
+def ingest_data(url, key, path, api_name, f_name, validators=None):
+    """Stream api_name into path/f_name and return whether its content changed.
+
+    The file is compressed according to RAW_COMPRESSION, which adds a .gz/.zst
+    suffix. When a validators dict is given the request is conditional and an
+    unchanged payload is neither rewritten nor reported as changed.
+    """
     parameters={}
     headers={}
     headers['X-Auth-Token'] = key
     full_url = url + api_name
-    file_name = os.path.join(path, f_name)
+    file_name = os.path.join(path, stored_name(f_name))
+    if validators is not None:
+        if not any(os.path.exists(os.path.join(path, name)) for name in candidate_names(f_name)):
+            # Nothing on disk to fall back to, so force a full download
+            validators.pop(f_name, None)
+        headers.update(conditional_headers(validators, f_name))
     try:
-        result = wrappedRequest(full_url, params=parameters, headers=headers)
+        result = wrappedRequest(full_url, params=parameters, headers=headers, stream=True)
         r = result.get('result')
 
-        print("Response Code = {}, requested URL {}".format(r.status_code, r.url))
-        json_data = json.loads(r.text)
-        with open(file_name, mode='w', encoding='utf-8') as f:
-            f.write(json.dumps(json_data))
+        try:
+            print("Response Code = {}, requested URL {}".format(r.status_code, r.url))
+            if validators is not None and r.status_code == 304:
+                print("{} is unchanged, skipping".format(file_name))
+                return False
+
+            # Write next to the target and swap in, so a failed download never leaves half a file
+            part_name = file_name + '.part'
+            try:
+                with open(part_name, mode='wb') as raw_f, compressing_writer(raw_f) as f:
+                    digest = stream_response(r, f)
+                if validators is not None and not record_validators(validators, f_name, r, digest):
+                    print("{} is unchanged, skipping".format(file_name))
+                    return False
+                os.replace(part_name, file_name)
+            finally:
+                if os.path.exists(part_name):
+                    os.remove(part_name)
+        finally:
+            r.close()
         print("Downloaded data in file {}".format(file_name))
+        return True
     except Exception as error:
         print(error)
         raise
 
-def upload_json_to_s3(json_data: dict, bucket_name: str, s3_filename: str):
-    """Uploads JSON data to S3 bucket using in-memory storage."""
-    json_buffer = StringIO()
-    json.dump(json_data, json_buffer, indent=2)
-    
-    s3_client = boto3.client(
-        service_name="s3",
-        aws_access_key_id=ENV["AWS_ACCESS_KEY"],
-        aws_secret_access_key=ENV["AWS_SECRET_KEY"]
-    )
-    
-    try:
-        s3_client.put_object(
-            Bucket=bucket_name,
-            Key=s3_filename,
-            Body=json_buffer.getvalue(),
-            ContentType='application/json'
-        )
-        print(f"JSON file uploaded to S3 bucket '{bucket_name}' as '{s3_filename}'")
-    except Exception as e:
-        print(f"Failed to upload JSON file to S3: {e}")
-        raise
 
+def ingest_data_to_s3(url, key, bucket_name, api_name, s3_filename, validators=None):
+    """Stream data from the API straight to S3, returning whether it changed.
 
-def ingest_data_to_s3(url, key, bucket_name, api_name, s3_filename):
-    """Extract data from API and upload directly to S3."""
+    The body is spooled (in memory up to SPOOL_SIZE, then /tmp) so an unchanged
+    payload can be skipped before anything is uploaded. The object is compressed
+    according to RAW_COMPRESSION, which adds a .gz/.zst suffix to the key.
+    """
+    compression = raw_compression()
     parameters = {}
     headers = {}
     headers['X-Auth-Token'] = key
     full_url = url + api_name
+    if validators is not None:
+        if find_raw_object(get_s3_client(), bucket_name, s3_filename) is None:
+            # The object was deleted or expired, so a 304 would leave nothing to parse
+            validators.pop(s3_filename, None)
+        headers.update(conditional_headers(validators, s3_filename))
     
     try:
-        result = wrappedRequest(full_url, params=parameters, headers=headers)
+        result = wrappedRequest(full_url, params=parameters, headers=headers, stream=True)
         r = result.get('result')
         
-        print("Response Code = {}, requested URL {}".format(r.status_code, r.url))
-        json_data = json.loads(r.text)
-        
-        # Upload directly to S3
-        upload_json_to_s3(json_data, bucket_name, s3_filename)
+        try:
+            print("Response Code = {}, requested URL {}".format(r.status_code, r.url))
+            if validators is not None and r.status_code == 304:
+                print("{} is unchanged, skipping".format(s3_filename))
+                return False
+
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+                with compressing_writer(spool, compression) as f:
+                    digest = stream_response(r, f)
+                if validators is not None and not record_validators(validators, s3_filename, r, digest):
+                    print("{} is unchanged, skipping".format(s3_filename))
+                    return False
+                spool.seek(0)
+                get_s3_client().upload_fileobj(spool, bucket_name, stored_name(s3_filename, compression),
+                                               ExtraArgs={'ContentType': CONTENT_TYPES[compression]})
+        finally:
+            r.close()
         print("Data uploaded to S3 as {}".format(s3_filename))
+        return True
         
     except Exception as error:
         print(error)
         raise
 
+def extract_endpoints(ingest, url, key, target, endpoints=None, max_workers=None, validators=None):
+    """Fetch every endpoint concurrently with ingest (ingest_data or ingest_data_to_s3).
+
+    target is the JSON directory or bucket name passed through to ingest.
+    endpoints defaults to the expanded job spec. The pool size defaults to
+    EXTRACT_WORKERS, then the spec's max_workers, then one worker per endpoint.
+    Returns whether each output file changed; failures are reported per output
+    file in the raised StageError.
+    """
+    spec = load_job_spec() if endpoints is None or max_workers is None else {}
+    if endpoints is None:
+        endpoints = expand_jobs(spec)
+    if max_workers is None:
+        max_workers = int(ENV.get('EXTRACT_WORKERS', spec.get('max_workers', len(endpoints))))
+    extra = () if validators is None else (validators,)
+    tasks = {f_name: (ingest, (url, key, target, api_name, f_name) + extra)
+             for api_name, f_name in endpoints}
+    return runConcurrently(tasks, max_workers=max_workers)
+
 if __name__ == '__main__':
     load_dotenv()
     base_url = ENV['API_URL']
     api_key = ENV['API_KEY']
     json_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "json_files")
 
-    ingest_data(base_url, api_key, json_path, 'v4/teams/61/matches/', "ChelseaMatches.json")
-    ingest_data(base_url, api_key, json_path, 'v4/teams/61', "ChelseaTeamDetails.json")
-    ingest_data(base_url, api_key, json_path, 'v4/competitions/2021/standings', "PremierLeagueStandings.json")
-    ingest_data(base_url, api_key, json_path, 'v4/competitions/2001/standings', "ChampionsLeagueStandings.json")
\ No newline at end of file
+    extract_endpoints(ingest_data, base_url, api_key, json_path)
\ No newline at end of file
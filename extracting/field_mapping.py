@@ -0,0 +1,190 @@
+"""Declarative specs mapping each output table's columns to paths in the API's JSON.
+
+A path is a dotted list of keys and list indexes, e.g. 'score.fullTime.home' or
+'referees.0.name'. A missing key, an out-of-range index or a null on the way
+yields None. Specs are compiled into extractor functions once, at import, and
+are shared by the local (parse_data) and S3 (parse_data_cloud) parsers.
+"""
+
+from collections import namedtuple
+
+
+def compile_path(path):
+    """Return a function that reads path out of a decoded JSON document."""
+    parts = tuple(int(part) if part.isdigit() else part for part in path.split('.'))
+
+    if len(parts) == 1 and isinstance(parts[0], str):
+        key = parts[0]
+        return lambda doc: doc.get(key) if isinstance(doc, dict) else None
+
+    def extract(doc):
+        for part in parts:
+            if isinstance(part, int):
+                doc = doc[part] if isinstance(doc, list) and len(doc) > part else None
+            else:
+                doc = doc.get(part) if isinstance(doc, dict) else None
+            if doc is None:
+                return None
+        return doc
+    return extract
+
+
+class TableSpec:
+    """One output table: its CSV file name, where its records live and how each column is read.
+
+    rows is the path to the list of records in the document, or None when the
+    whole document is a single record. columns is a list of (column, path) pairs.
+    """
+
+    def __init__(self, file_name, columns, rows=None):
+        self.file_name = file_name
+        self.col_names = [column for column, _ in columns]
+        # Rows are compact tuples in column order, still readable by name (row.MATCH_ID)
+        self.row_type = namedtuple('Row', self.col_names)
+        self.getters = [compile_path(path) for _, path in columns]
+        self.rows = rows
+        self.records = compile_path(rows) if rows else None
+
+    def extract(self, doc):
+        """Return the table's rows for doc, as row_type tuples in column order."""
+        records = [doc] if self.records is None else (self.records(doc) or [])
+        return list(self.iter_rows(records))
+
+    def iter_rows(self, records):
+        """Lazily turn already-located records into rows, e.g. as they are streamed from a file."""
+        make = self.row_type._make
+        getters = self.getters
+        for record in records:
+            yield make([get(record) for get in getters])
+
+
+def extract_tables(doc, specs):
+    """Run several specs over one decoded document, returning each spec's rows in order."""
+    return [spec.extract(doc) for spec in specs]
+
+
+def parse_sources(read, sources, specs, file_names=None):
+    """The parse flow shared by the local and S3 parsers, whatever the storage.
+
+    Each raw JSON file in sources is decoded with read(name) and every spec's
+    rows are extracted from it, concatenated across sources. Returns
+    {file_name: (spec, rows)}; file_names overrides the specs' own file names,
+    e.g. to fill in the league of the standings table.
+    """
+    file_names = file_names or [spec.file_name for spec in specs]
+    tables = {file_name: (spec, []) for spec, file_name in zip(specs, file_names)}
+    for source in sources:
+        doc = read(source)
+        for (_, rows), doc_rows in zip(tables.values(), extract_tables(doc, specs)):
+            rows.extend(doc_rows)
+    return tables
+
+
+MATCHES = TableSpec('ChelseaMatches.csv', rows='matches', columns=[
+    ('AREA_NAME', 'area.name'),
+    ('COMPETITION_ID', 'competition.id'),
+    ('COMPETITION_NAME', 'competition.name'),
+    ('SEASON_ID', 'season.id'),
+    ('SEASON_STARTDATE', 'season.startDate'),
+    ('SEASON_ENDDATE', 'season.endDate'),
+    ('CURRENT_MATCHDAY', 'season.currentMatchday'),
+    ('MATCH_ID', 'id'),
+    ('MATCH_DATE', 'utcDate'),
+    ('STATUS', 'status'),
+    ('STAGE', 'stage'),
+    ('COMP_GROUP', 'group'),
+    ('HOME_TEAM_NAME', 'homeTeam.name'),
+    ('HOME_TEAM_ID', 'homeTeam.id'),
+    ('HOME_TEAM_TLA', 'homeTeam.tla'),
+    ('HOME_TEAM_CREST', 'homeTeam.crest'),
+    ('AWAY_TEAM_NAME', 'awayTeam.name'),
+    ('AWAY_TEAM_ID', 'awayTeam.id'),
+    ('AWAY_TEAM_TLA', 'awayTeam.tla'),
+    ('AWAY_TEAM_CREST', 'awayTeam.crest'),
+    ('WINNER', 'score.winner'),
+    ('DURATION', 'score.duration'),
+    ('FULLTIME_AWAY', 'score.fullTime.away'),
+    ('FULLTIME_HOME', 'score.fullTime.home'),
+    ('HALFTIME_AWAY', 'score.halfTime.away'),
+    ('HALFTIME_HOME', 'score.halfTime.home'),
+    # Referees is a list — we want the first referee if present
+    ('REFEREE_NAME', 'referees.0.name'),
+    ('REFEREE_NATIONALITY', 'referees.0.nationality'),
+])
+
+TEAM_DETAILS = TableSpec('ChelseaTeamDetails.csv', columns=[
+    ('AREA_ID', 'area.id'),
+    ('AREA_NAME', 'area.name'),
+    ('AREA_CODE', 'area.code'),
+    ('AREA_FLAG', 'area.flag'),
+    ('TEAM_ID', 'id'),
+    ('TEAM_NAME', 'name'),
+    ('TEAM_SHORTNAME', 'shortName'),
+    ('TEAM_TLA', 'tla'),
+    ('TEAM_CREST', 'crest'),
+    ('ADDRESS', 'address'),
+    ('WEBSITE', 'website'),
+    ('FOUNDED', 'founded'),
+    ('CLUB_COLORS', 'clubColors'),
+    ('VENUE', 'venue'),
+    ('COACH_ID', 'coach.id'),
+    ('COACH_FIRSTNAME', 'coach.firstName'),
+    ('COACH_LASTNAME', 'coach.lastName'),
+    ('COACH_NAME', 'coach.name'),
+    ('COACH_DOB', 'coach.dateOfBirth'),
+    ('COACH_NATIONALITY', 'coach.nationality'),
+    ('COACH_CONTRACT_START', 'coach.contract.start'),
+    ('COACH_CONTRACT_UNTIL', 'coach.contract.until'),
+])
+
+PLAYERS = TableSpec('ChelseaPlayers.csv', rows='squad', columns=[
+    ('PLAYER_ID', 'id'),
+    ('PLAYER_NAME', 'name'),
+    ('PLAYER_POSITION', 'position'),
+    ('PLAYER_DOB', 'dateOfBirth'),
+    ('PLAYER_NATIONALITY', 'nationality'),
+])
+
+COMPETITION_DETAILS = TableSpec('CompetitionDetails.csv', columns=[
+    ('SEASON', 'filters.season'),
+    ('AREA_ID', 'area.id'),
+    ('AREA_NAME', 'area.name'),
+    ('AREA_CODE', 'area.code'),
+    ('AREA_FLAG', 'area.flag'),
+    ('COMPETITION_ID', 'competition.id'),
+    ('COMPETITION_NAME', 'competition.name'),
+    ('COMPETITION_CODE', 'competition.code'),
+    ('COMPETITION_TYPE', 'competition.type'),
+    ('COMPETITION_EMBLEM', 'competition.emblem'),
+    ('SEASON_ID', 'season.id'),
+    ('SEASON_STARTDATE', 'season.startDate'),
+    ('SEASON_ENDDATE', 'season.endDate'),
+    ('CURRENT_MATCHDAY', 'season.currentMatchday'),
+    ('SEASON_WiNNER', 'season.winner'),
+    # Standings is a list, so we pull the first one (if exists)
+    ('STAGE', 'standings.0.stage'),
+    ('STANDINGS_TYPE', 'standings.0.type'),
+    ('COMP_GROUP', 'standings.0.group'),
+])
+
+# file_name is completed with the league, e.g. 'Premier' -> PremierLeagueStandings.csv
+STANDINGS = TableSpec('{league}LeagueStandings.csv', rows='standings.0.table', columns=[
+    ('POSITION', 'position'),
+    ('TEAM_ID', 'team.id'),
+    ('TEAM_NAME', 'team.name'),
+    ('TEAM_SHORTNAME', 'team.shortName'),
+    ('TEAM_TLA', 'team.tla'),
+    ('TEAM_CREST', 'team.crest'),
+    ('PLAYED_GAMES', 'playedGames'),
+    ('FORM', 'form'),
+    ('WON', 'won'),
+    ('DRAW', 'draw'),
+    ('LOST', 'lost'),
+    ('POINTS', 'points'),
+    ('GOALS_FOR', 'goalsFor'),
+    ('GOALS_AGAINST', 'goalsAgainst'),
+    ('GOAL_DIFFERENCE', 'goalDifference'),
+])
+
+# Tables built from a single ChelseaTeamDetails.json document
+TEAM_TABLES = (TEAM_DETAILS, PLAYERS)
@@ -1,7 +1,24 @@
 import csv
 import os
-from  requests import get
-from time import sleep
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from time import monotonic, sleep
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class StageError(Exception):
+    """Raised when one or more tasks of a concurrent stage fail."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('{} task(s) failed: {}'.format(
+            len(errors), '; '.join('{}: {}'.format(name, err) for name, err in errors.items())))
 
 def removeCSV(object, writePath):
     file_prefix1 = object
@@ -19,44 +36,254 @@ def removeCSV(object, writePath):
 def writeData2CSV(file_name, writePath, col_names, row_data):
 
     op_file = os.path.join(writePath, file_name)
+    # Written next to the target and swapped in once every row is out, so a row stream
+    # that fails part-way leaves the last good file in place rather than half a file
+    part_file = op_file + '.part'
+
+    # Rows may be sequences in col_names order (bulk-written by a plain writer) or dicts keyed by column
+    row_data = iter(row_data)
 
     try:
-        with open(op_file, 'w', encoding='utf-8', newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=col_names, quoting=csv.QUOTE_MINIMAL)
+        first = next(row_data, None)
+        with open(part_file, 'w', encoding='utf-8', newline='') as csvfile:
+            if isinstance(first, dict):
+                writer = csv.DictWriter(csvfile, fieldnames=col_names, quoting=csv.QUOTE_MINIMAL)
+                writer.writeheader()
+            else:
+                writer = csv.writer(csvfile, quoting=csv.QUOTE_MINIMAL)
+                writer.writerow(col_names)
 
-            writer.writeheader()
-            for row in row_data:
-                writer.writerow(row)
+            if first is not None:
+                writer.writerow(first)
+                writer.writerows(row_data)
+        os.replace(part_file, op_file)
         print('Data written to {}'.format(op_file))
     except Exception as error:
         print(error)
         raise
+    finally:
+        if os.path.exists(part_file):
+            os.remove(part_file)
+
+
+
+def getSession(pool_size=None):
+    """Return the process-wide requests Session, creating it on first use.
+
+    The session keeps connections to the API alive between requests and retries.
+    pool_size (default HTTP_POOL_SIZE, or 10) bounds the connections kept per host
+    and only applies when the session is first created.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            if pool_size is None:
+                pool_size = int(os.environ.get('HTTP_POOL_SIZE', 10))
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+def closeSession():
+    """Close the shared session so the next getSession call builds a new one."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def get(url, params=None, **kwargs):
+    """Send a GET request over the shared keep-alive session."""
+    return getSession().get(url, params=params, **kwargs)
+
+
+def headerSeconds(headers, name):
+    """Return header name as a number of seconds, or None if it is missing or unparseable.
+
+    Accepts plain numbers (as sent by football-data.org) and HTTP dates for Retry-After.
+    """
+    value = headers.get(name) if headers is not None else None
+    if isinstance(value, (int, float)):
+        return max(float(value), 0.0)
+    if not isinstance(value, str):
+        return None
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
 
 
+class RateLimiter:
+    """Token bucket shared by every API request in the process.
 
-def wrappedRequest( url, params, headers,proxies=None, retry=3 ):
+    Without quota information it refills continuously at rate requests per
+    period. Once the API reports its quota (X-Requests-Available-Minute and
+    X-RequestCounter-Reset) the bucket follows the server's window instead:
+    the remaining count, less requests still in flight, is what may be sent
+    until the reset, when the bucket refills. Retry-After on an error
+    response, or a 429 without it, holds every caller until the given time.
+    """
 
+    def __init__(self, rate=None, period=60.0):
+        if rate is None:
+            rate = int(os.environ.get('API_RATE_LIMIT', 10))
+        self.capacity = float(rate)
+        self.fill_rate = rate / period
+        self.tokens = float(rate)
+        self.updated = monotonic()
+        self.reset_at = None
+        self.blocked_until = 0.0
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.reset_at is not None:
+            if now >= self.reset_at:
+                self.tokens = self.capacity
+                self.reset_at = None
+                self.updated = now
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a request may be sent, then take a token for it."""
+        while True:
+            with self.lock:
+                now = monotonic()
+                self._refill(now)
+                wait = self.blocked_until - now
+                if wait <= 0 and self.tokens >= 1:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    return
+                if wait <= 0:
+                    if self.reset_at is not None:
+                        wait = self.reset_at - now
+                    else:
+                        wait = (1 - self.tokens) / self.fill_rate
+            sleep(wait)
+
+    def release(self, headers=None, status_code=None):
+        """Finish a request taken with acquire, syncing the bucket with the response's quota headers."""
+        remaining = headerSeconds(headers, 'X-Requests-Available-Minute')
+        reset = headerSeconds(headers, 'X-RequestCounter-Reset')
+        retry_after = headerSeconds(headers, 'Retry-After')
+        with self.lock:
+            now = monotonic()
+            self.in_flight = max(self.in_flight - 1, 0)
+            if remaining is not None and reset is not None:
+                self.tokens = max(remaining - self.in_flight, 0)
+                self.reset_at = now + reset
+                self.updated = now
+            if status_code == 429:
+                if retry_after is None:
+                    retry_after = reset if reset is not None else 1 / self.fill_rate
+                # Treat the wait as the end of the server's window
+                self.tokens = 0
+                self.reset_at = now + retry_after
+            if retry_after is not None and status_code is not None and status_code >= 400:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+
+_rate_limiter = None
+
+
+def getRateLimiter():
+    """Return the process-wide RateLimiter, creating it on first use."""
+    global _rate_limiter
+    with _session_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+        return _rate_limiter
+
+
+def resetRateLimiter():
+    """Drop the shared RateLimiter so the next getRateLimiter call builds a new one."""
+    global _rate_limiter
+    with _session_lock:
+        _rate_limiter = None
+
+
+def wrappedRequest( url, params, headers,proxies=None, retry=3, limiter=None, stream=False ):
+    """GET url through the shared rate limiter, retrying failed attempts.
+
+    429s, and errors carrying Retry-After, wait for the time the API asks for;
+    other errors back off exponentially from one second. After retry attempts the last response is returned, or the
+    last exception raised. With stream=True the body is left unread for the caller.
+    """
+    if limiter is None:
+        limiter = getRateLimiter()
     lastException = None
-    interval = 5.0
     x = 0
     for x in range(retry):
+        backoff = min(2.0 ** x, 30.0)
         try:
             print(url, params, proxies, headers)
 
-            result = get(url, params, proxies= proxies, headers=headers)
+            limiter.acquire()
+            result = None
+            try:
+                result = get(url, params, proxies= proxies, headers=headers, stream=stream)
+            finally:
+                if result is None:
+                    limiter.release()
+                else:
+                    limiter.release(result.headers, result.status_code)
 
-            if result is not None and result.status_code != 200 and (x + 1) < retry:
+            if result is not None and result.status_code not in (200, 304) and (x + 1) < retry:
+                # Hand the connection back to the pool before trying again
+                result.close()
+                if result.status_code == 429 or (result.status_code >= 400
+                                                 and headerSeconds(result.headers, 'Retry-After') is not None):
+                    # The limiter now holds every request until the time the API asked for
+                    print('Encountered response code {e}, waiting for the rate limit'.format(e=result.status_code))
+                    continue
                 print(
-                    'Encountered response code {e}, sleeping for {i} seconds'.format(e=result.status_code, i=interval * (x + 1)))
-                sleep(interval * (x + 1))
+                    'Encountered response code {e}, sleeping for {i} seconds'.format(e=result.status_code, i=backoff))
+                sleep(backoff)
                 continue
             return {"result":result, "retry":x}
         except Exception as e:
             lastException = e
             if (x+1) < retry:
-                print('Encountered exception {e}, sleeping for {i} seconds'.format(e=lastException, i=interval * (x+1)))
-                sleep(interval*(x+1))
+                print('Encountered exception {e}, sleeping for {i} seconds'.format(e=lastException, i=backoff))
+                sleep(backoff)
 
 
     if lastException is not None:
-        raise
+        raise lastException
+
+
+def runConcurrently(tasks, max_workers=4, processes=False):
+    """Run each (function, args) in tasks on a bounded thread pool.
+
+    tasks maps a name to a (function, args) tuple. Every task runs to completion
+    even if others fail; the results are returned by name, or a StageError is
+    raised listing every task that failed. With processes=True the tasks run in a
+    process pool instead, for CPU-bound work; functions and args must then be picklable.
+    """
+    results = {}
+    errors = {}
+    pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with pool(max_workers=max(1, min(max_workers, len(tasks) or 1))) as executor:
+        futures = {executor.submit(func, *args): name for name, (func, args) in tasks.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as error:
+                print('Task {} failed: {}'.format(name, error))
+                errors[name] = error
+
+    if errors:
+        raise StageError(errors)
+    return results
@@ -0,0 +1,70 @@
+"""Expands the extraction job spec (jobs.json) into the list of API endpoints to fetch."""
+
+import os
+import json
+from os import environ as ENV
+
+DEFAULT_SPEC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.json")
+
+
+def load_job_spec(path=None):
+    """Read the job spec from path, JOB_SPEC, or the jobs.json shipped with the pipeline."""
+    if path is None:
+        path = ENV.get('JOB_SPEC', DEFAULT_SPEC_PATH)
+    with open(path, mode='r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def season_suffix(api_name, f_name, season):
+    """Return (api_name, f_name) restricted to season; None means the current season."""
+    if season is None:
+        return api_name, f_name
+    stem, ext = os.path.splitext(f_name)
+    return "{}?season={}".format(api_name, season), "{}_{}{}".format(stem, season, ext)
+
+
+def expand_jobs(spec):
+    """Expand spec into a de-duplicated list of (api_name, file_name) pairs.
+
+    Every team gets its matches (per season) and team details. Standings are
+    fetched once per competition and season however many teams play in it.
+    A competition missing from spec["competitions"] is named Competition<id>.
+    """
+    seasons = spec.get('seasons') or [None]
+    competition_names = {c['id']: c['name'] for c in spec.get('competitions', [])}
+    competition_ids = list(competition_names)
+
+    jobs = []
+    for team in spec.get('teams', []):
+        for season in seasons:
+            jobs.append(season_suffix('v4/teams/{}/matches/'.format(team['id']),
+                                      "{}Matches.json".format(team['name']), season))
+        jobs.append(('v4/teams/{}'.format(team['id']), "{}TeamDetails.json".format(team['name'])))
+        competition_ids.extend(team.get('competitions', []))
+
+    for competition_id in competition_ids:
+        name = competition_names.get(competition_id, "Competition{}".format(competition_id))
+        for season in seasons:
+            jobs.append(season_suffix('v4/competitions/{}/standings'.format(competition_id),
+                                      "{}Standings.json".format(name), season))
+
+    endpoints = []
+    seen = set()
+    for api_name, f_name in jobs:
+        if api_name in seen:
+            continue
+        seen.add(api_name)
+        endpoints.append((api_name, f_name))
+    return endpoints
+
+
+def require_files(endpoints, file_names):
+    """Raise ValueError if any of file_names is not written by one of endpoints.
+
+    The parse stages read their JSON files by name, so a spec that stops fetching
+    one would otherwise leave them parsing (or skipping) a stale copy.
+    """
+    fetched = {f_name for _, f_name in endpoints}
+    missing = [f_name for f_name in file_names if f_name not in fetched]
+    if missing:
+        raise ValueError("The job spec does not fetch {}, which the parse stages read".format(", ".join(missing)))
@@ -0,0 +1,94 @@
+"""Incremental reading of one top-level array out of a large JSON document.
+
+iter_array_items yields the items of doc[key] one at a time while reading the
+file in chunks, so memory use is bounded by the largest single item rather
+than the whole payload. Other top-level values are decoded and discarded.
+"""
+
+import json
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+DELIMITERS = WHITESPACE + ',]}'
+
+
+class _Reader:
+    """A sliding text buffer over f with just enough helpers to walk JSON."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        """Drop consumed text and append the next chunk, reading more the bigger the pending value."""
+        chunk = self.f.read(max(self.chunk_size, len(self.buf) - self.pos))
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                raise ValueError("Unexpected end of JSON document")
+            self.fill()
+
+    def expect(self, chars):
+        char = self.peek()
+        if char not in chars:
+            raise ValueError("Expected one of {!r} at offset {}, found {!r}".format(chars, self.pos, char))
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self.fill()
+                continue
+            # A number is only complete once a delimiter follows it; "12" may be "123e4" after the next chunk
+            if (isinstance(value, (int, float)) and not self.eof
+                    and (end == len(self.buf) or self.buf[end] not in DELIMITERS)):
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_array_items(f, key, chunk_size=CHUNK_SIZE):
+    """Yield each item of the array stored under key in the top-level object read from text file f.
+
+    Yields nothing if the key is missing or null.
+    """
+    reader = _Reader(f, chunk_size)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        name = reader.value()
+        reader.expect(':')
+        if name == key and reader.peek() == '[':
+            reader.expect('[')
+            if reader.peek() == ']':
+                return
+            while True:
+                yield reader.value()
+                if reader.expect(',]') == ']':
+                    return
+        reader.value()
+        if reader.expect(',}') == '}':
+            return
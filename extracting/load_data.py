@@ -1,19 +1,23 @@
 from dotenv import load_dotenv
+import csv
+import queue
+import time
 import psycopg2
 from psycopg2 import extras
 import os
 from os import environ as ENV
 from io import StringIO
-import boto3
-import pandas as pd
-
-def get_s3_client():
-    """Create and return S3 client."""
-    return boto3.client(
-        service_name="s3",
-        aws_access_key_id=ENV["AWS_ACCESS_KEY"],
-        aws_secret_access_key=ENV["AWS_SECRET_KEY"]
-    )
+from aws_clients import get_s3_client
+from columnar import arrow_to_csv, output_format, output_name, read_parquet
+from table_schemas import COLUMNS, PRIMARY_KEYS, table_for_file
+from helperFunction import runConcurrently
+from binary_copy import BinaryCopyStream, encode_arrow, encode_rows
+from load_metrics import LEDGER_TABLE, TableMetrics, emit_run, metered, new_run_id, record_run, run_summary
+
+LOAD_MODES = ('replace', 'merge', 'swap')
+COPY_FORMATS = ('csv', 'binary')
+COPY_CHUNK_SIZE = 64 * 1024
+
 
 def connect_to_postgres():
     """Return a connection to the RDS database."""
@@ -26,13 +30,328 @@ def connect_to_postgres():
                             cursor_factory=psycopg2.extras.RealDictCursor)
 
 
+def load_mode():
+    """Return the configured load mode: 'replace' (truncate and COPY, the default) or 'merge'."""
+    mode = ENV.get('LOAD_MODE', 'replace').lower()
+    if mode not in LOAD_MODES:
+        raise ValueError(f"LOAD_MODE must be one of {LOAD_MODES}, got {mode!r}")
+    return mode
+
+
+def copy_format():
+    """Return the configured COPY format for typed sources: 'csv' (the default) or 'binary'.
+
+    Only rows loaded from memory and Parquet tables are typed; CSV files are always COPYed as CSV.
+    """
+    fmt = ENV.get('COPY_FORMAT', 'csv').lower()
+    if fmt not in COPY_FORMATS:
+        raise ValueError(f"COPY_FORMAT must be one of {COPY_FORMATS}, got {fmt!r}")
+    return fmt
+
+
+def copy_binary(cursor, chunks, table_name: str, target=None):
+    """COPY binary COPY data for table_name (chunks from binary_copy's encoders) into table_name."""
+    columns = ", ".join(column for column, _ in COLUMNS[table_name])
+    cursor.copy_expert(f"COPY {target or table_name} ({columns}) FROM STDIN WITH (FORMAT binary)",
+                       BinaryCopyStream(chunks), size=COPY_CHUNK_SIZE)
+
+
+def merge_sql(table_name: str, staging: str):
+    """Return the upsert and delete statements that merge staging into table_name on its primary key.
+
+    The upsert only rewrites rows whose values actually changed, and reports how
+    many rows it inserted and updated; the delete removes rows no longer in staging.
+    """
+    columns = [column for column, _ in COLUMNS[table_name]]
+    keys = PRIMARY_KEYS[table_name]
+    values = [column for column in columns if column not in keys]
+    column_list = ", ".join(columns)
+
+    upsert = (
+        f"WITH upserted AS ("
+        f"INSERT INTO {table_name} ({column_list}) SELECT {column_list} FROM {staging} "
+        f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET "
+        + ", ".join(f"{column} = EXCLUDED.{column}" for column in values)
+        + f" WHERE ({', '.join(f'{table_name}.{column}' for column in values)})"
+        f" IS DISTINCT FROM ({', '.join(f'EXCLUDED.{column}' for column in values)})"
+        f" RETURNING (xmax = 0) AS inserted) "
+        f"SELECT count(*) FILTER (WHERE inserted) AS inserted, "
+        f"count(*) FILTER (WHERE NOT inserted) AS updated FROM upserted;"
+    )
+    delete = (
+        f"DELETE FROM {table_name} WHERE NOT EXISTS (SELECT 1 FROM {staging} WHERE "
+        + " AND ".join(f"{staging}.{key} = {table_name}.{key}" for key in keys)
+        + ");"
+    )
+    return upsert, delete
+
+
+def lock_table(cursor, table_name: str, mode: str, metrics=None):
+    """LOCK table_name in mode, adding the time spent waiting for the lock to metrics."""
+    started = time.perf_counter()
+    cursor.execute(f'LOCK TABLE {table_name} IN {mode} MODE;')
+    if metrics is not None:
+        metrics.lock_wait_seconds += time.perf_counter() - started
+
+
+def load_table(cursor, table_name: str, copy, metrics=None):
+    """Replace or merge table_name's contents with the rows that copy(cursor, target) COPYs into target.
+
+    target is table_name itself or a table shaped like it, e.g. a staging table;
+    the copy_* helpers take it as their target argument. In replace mode the
+    table is truncated and copied into directly. In merge mode (LOAD_MODE=merge)
+    the rows go to a temporary staging table first, and only the rows that were
+    added, changed or removed are written to table_name; the counts are returned
+    as a dict. Swap mode is handled by load_tables_parallel.
+    The COPY and the wait for the table's lock are recorded in metrics, if given.
+    """
+    if load_mode() == 'replace':
+        print(f'Truncating {table_name}')
+        lock_table(cursor, table_name, 'ACCESS EXCLUSIVE', metrics)
+        cursor.execute(f'TRUNCATE TABLE {table_name};')
+        print(f"Loading data into {table_name}...")
+        copy(metered(cursor, metrics), table_name)
+        print(f'Data saved to {table_name}')
+        return None
+
+    staging = f'{table_name}__staging'
+    cursor.execute(f'CREATE TEMP TABLE {staging} (LIKE {table_name}) ON COMMIT DROP;')
+    print(f"Loading data into {staging}...")
+    copy(metered(cursor, metrics), staging)
+
+    lock_table(cursor, table_name, 'ROW EXCLUSIVE', metrics)
+    counts = merge_from_staging(cursor, table_name, staging)
+    cursor.execute(f'DROP TABLE {staging};')
+    return counts
+
+
+def merge_from_staging(cursor, table_name: str, staging: str):
+    """Merge the rows COPYed into staging into table_name, returning the insert, update and delete counts."""
+    upsert, delete = merge_sql(table_name, staging)
+    cursor.execute(upsert)
+    row = cursor.fetchone()
+    counts = {'inserted': row['inserted'], 'updated': row['updated']}
+    cursor.execute(delete)
+    counts['deleted'] = cursor.rowcount
+
+    print(f"Merged into {table_name}: {counts['inserted']} inserted, "
+          f"{counts['updated']} updated, {counts['deleted']} deleted")
+    return counts
 
-def insert_data_to_db():
+
+def create_next_table(cursor, table_name: str, copy, metrics=None):
+    """Build <table>__next: COPY into a bare copy of table_name, then add its primary key and statistics.
+
+    The key is added after the COPY, so its index is built in one pass rather than row by row.
+    """
+    staging = f'{table_name}__next'
+    cursor.execute(f'DROP TABLE IF EXISTS {staging};')
+    cursor.execute(f'CREATE TABLE {staging} (LIKE {table_name} INCLUDING DEFAULTS);')
+    print(f"Loading data into {staging}...")
+    copy(metered(cursor, metrics), staging)
+    key = ", ".join(PRIMARY_KEYS[table_name])
+    cursor.execute(f'ALTER TABLE {staging} ADD CONSTRAINT {staging}_pkey PRIMARY KEY ({key});')
+    cursor.execute(f'ANALYZE {staging};')
+
+
+def swap_lock_timeout():
+    """Return how long a swap waits for readers to release a table (SWAP_LOCK_TIMEOUT, default 5s)."""
+    return ENV.get('SWAP_LOCK_TIMEOUT', '5s')
+
+
+def dependent_views(cursor, table_name: str):
+    """Return (view, kind, definition) for each view reading table_name directly, e.g. the dbt staging models.
+
+    kind is 'v' for a view and 'm' for a materialized view.
+    """
+    cursor.execute(
+        "SELECT DISTINCT view.oid::regclass::text AS name, view.relkind AS kind, "
+        "pg_get_viewdef(view.oid) AS definition "
+        "FROM pg_depend dep "
+        "JOIN pg_rewrite rule ON rule.oid = dep.objid "
+        "JOIN pg_class view ON view.oid = rule.ev_class "
+        "WHERE dep.classid = 'pg_rewrite'::regclass AND dep.refobjid = %s::regclass "
+        "AND view.relkind IN ('v', 'm') AND view.oid <> dep.refobjid;",
+        (table_name,))
+    return [(row['name'], row['kind'], row['definition']) for row in cursor.fetchall()]
+
+
+def view_indexes(cursor, view: str):
+    """Return the CREATE INDEX statements of a materialized view's indexes."""
+    cursor.execute("SELECT pg_get_indexdef(indexrelid) AS definition FROM pg_index WHERE indrelid = %s::regclass;",
+                   (view,))
+    return [row['definition'] for row in cursor.fetchall()]
+
+
+def swap_table(cursor, table_name: str, staging: str, metrics=None):
+    """Rename staging over table_name within the caller's transaction, keeping views that read it.
+
+    Views follow a table through a rename, so their definitions are read first
+    and re-created against the new table before the old one is dropped.
+    Materialized views cannot be replaced in place; they are dropped and rebuilt
+    from the new table, with their indexes. The ACCESS EXCLUSIVE lock this takes
+    is held only for these changes; SWAP_LOCK_TIMEOUT stops it from queueing
+    behind a long-running query.
+    """
+    cursor.execute("SET LOCAL lock_timeout = %s;", (swap_lock_timeout(),))
+    lock_table(cursor, table_name, 'ACCESS EXCLUSIVE', metrics)
+    views = dependent_views(cursor, table_name)
+    indexes = {view: view_indexes(cursor, view) for view, kind, _ in views if kind == 'm'}
+
+    cursor.execute(f'ALTER TABLE {table_name} RENAME TO {table_name}__old;')
+    cursor.execute(f'ALTER TABLE {staging} RENAME TO {table_name};')
+    for view, kind, definition in views:
+        if kind == 'm':
+            cursor.execute(f'DROP MATERIALIZED VIEW {view};')
+            cursor.execute(f'CREATE MATERIALIZED VIEW {view} AS {definition}')
+            for index in indexes[view]:
+                cursor.execute(f'{index};')
+        else:
+            cursor.execute(f'CREATE OR REPLACE VIEW {view} AS {definition}')
+    cursor.execute(f'DROP TABLE {table_name}__old;')
+    cursor.execute(f'ALTER TABLE {table_name} RENAME CONSTRAINT {staging}_pkey TO {table_name}_pkey;')
+    print(f'Swapped {staging} in as {table_name}')
+    return None
+
+
+def load_workers():
+    """Return how many connections load tables at once (LOAD_WORKERS, default 1: one table after another)."""
+    return max(1, int(ENV.get('LOAD_WORKERS', 1)))
+
+
+def record_load(cursor, metrics, workers):
+    """Append this load's per-table metrics to the pipeline_runs ledger, returning them as rows.
+
+    The rows are written inside the load's transaction, under a savepoint, so
+    a missing or broken ledger table is reported without failing the load.
+    """
+    settings = {'load_mode': load_mode(), 'copy_format': copy_format(), 'load_workers': workers}
+    summary = run_summary(new_run_id(), settings, metrics)
+    cursor.execute('SAVEPOINT ledger;')
+    try:
+        record_run(cursor, summary)
+        cursor.execute('RELEASE SAVEPOINT ledger;')
+    except psycopg2.Error as error:
+        cursor.execute('ROLLBACK TO SAVEPOINT ledger;')
+        print(f"Could not record the load in {LEDGER_TABLE}: {error}")
+    return summary
+
+
+def load_tables(copies):
+    """Load each table in copies ({table_name: copy(cursor, target)}) per LOAD_MODE, all in one commit.
+
+    With LOAD_WORKERS above 1, or in swap mode, the tables are loaded by
+    load_tables_parallel instead, so every table is built before any is swapped.
+    Either way each table's COPY and lock wait are recorded with record_load.
+    """
+    if load_mode() == 'swap' or (load_workers() > 1 and len(copies) > 1):
+        return load_tables_parallel(copies, load_workers())
 
     conn = connect_to_postgres()
+    counts = {}
+    metrics = {table_name: TableMetrics(table_name) for table_name in copies}
+    try:
+        with conn.cursor() as cursor:
+            for table_name, copy in copies.items():
+                counts[table_name] = load_table(cursor, table_name, copy, metrics[table_name])
+            summary = record_load(cursor, metrics, workers=1)
+
+        conn.commit()
+        emit_run(summary)
+        return counts
+
+    except Exception as e:
+        conn.rollback()
+        print(f"Error occurred: {e}")
+        raise
+    finally:
+        conn.close()
+
+
+def load_tables_parallel(copies, max_workers):
+    """COPY the tables concurrently over a small pool of connections, then publish them in one transaction.
+
+    Each table is first built and committed on its own, up to max_workers at a
+    time, so the slow part is bounded by the largest table. In replace and swap
+    mode it is built as an indexed <table>__next table, and the final transaction
+    only renames every one of them in, so readers see either all of the old
+    tables or all of the new ones and are only blocked for the renames. In merge
+    mode it is COPYed into an unlogged <table>__load table, and the final
+    transaction merges the changed rows into every live table.
+    """
+    merge = load_mode() == 'merge'
+    suffix = '__load' if merge else '__next'
+    metrics = {table_name: TableMetrics(table_name) for table_name in copies}
+    connections = queue.Queue()
+    opened = []
+
+    def stage(table_name, copy):
+        conn = connections.get()
+        try:
+            with conn.cursor() as cursor:
+                if merge:
+                    cursor.execute(f'DROP TABLE IF EXISTS {table_name}__load;')
+                    cursor.execute(f'CREATE UNLOGGED TABLE {table_name}__load (LIKE {table_name});')
+                    print(f"Loading data into {table_name}__load...")
+                    copy(metered(cursor, metrics[table_name]), f'{table_name}__load')
+                else:
+                    create_next_table(cursor, table_name, copy, metrics[table_name])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            connections.put(conn)
+
+    try:
+        for _ in range(min(max_workers, len(copies))):
+            opened.append(connect_to_postgres())
+            connections.put(opened[-1])
+        runConcurrently({table_name: (stage, (table_name, copy)) for table_name, copy in copies.items()},
+                        max_workers=len(opened))
+
+        counts = {}
+        with opened[0].cursor() as cursor:
+            for table_name in copies:
+                counts[table_name] = publish_table(cursor, table_name, f'{table_name}{suffix}', metrics[table_name])
+            summary = record_load(cursor, metrics, workers=len(opened))
+            opened[0].commit()
+        print(f"Published {len(copies)} tables in one transaction")
+        emit_run(summary)
+        return counts
+
+    except Exception as e:
+        if opened:
+            opened[0].rollback()
+        print(f"Error occurred: {e}")
+        raise
+    finally:
+        # Staged tables are only scaffolding; never leave them behind
+        if opened:
+            try:
+                with opened[0].cursor() as cursor:
+                    for table_name in copies:
+                        cursor.execute(f'DROP TABLE IF EXISTS {table_name}{suffix};')
+                opened[0].commit()
+            except Exception as error:
+                print(f"Could not drop the {suffix} tables: {error}")
+        for opened_conn in opened:
+            opened_conn.close()
+
+
+def publish_table(cursor, table_name: str, staging: str, metrics=None):
+    """Make staging's rows table_name's contents: merged in merge mode, otherwise renamed in over it."""
+    if load_mode() == 'merge':
+        lock_table(cursor, table_name, 'ROW EXCLUSIVE', metrics)
+        return merge_from_staging(cursor, table_name, staging)
+    return swap_table(cursor, table_name, staging, metrics)
+
+
+def insert_data_to_db(tables=None):
+    """Load the parsed files into PostgreSQL; tables limits the load to those CSV names."""
 
     # Map CSV filenames to table names
-    tables = {
+    all_tables = {
         "ChampionsLeagueStandings.csv": "champions_league_standings",
         "PremierLeagueStandings.csv": "premier_league_standings",
         "ChelseaMatches.csv": "chelsea_matches",
@@ -40,68 +359,130 @@ def insert_data_to_db():
         "CompetitionDetails.csv": "competition_details",
         "ChelseaTeamDetails.csv": "chelsea_team_details"
     }
+    # Only reload the tables whose files were rewritten, when the caller knows which those are
+    tables = all_tables if tables is None else {csv_file: all_tables[csv_file] for csv_file in tables}
 
     csv_path = os.path.join(
     os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
     "csv_files")
     
 
-    with conn.cursor() as cursor:
-        for csv_file, table in tables.items():
-            file_path = os.path.join(csv_path, csv_file)
-            print(f'truncating {table}')
-            cursor.execute(f'truncate table {table};')
-            print(f"Loading {file_path} into {table}...")
+    parquet = output_format() == 'parquet'
 
-            with open(file_path, "r", encoding="utf-8") as f:
-                next(f)  # Skip header row
-                cursor.copy_from(f, table, sep=",", null="")
-            print(f'Data saved to {table}')
+    def copy_file(file_path, table):
+        def copy(cursor, target):
+            if parquet:
+                copy_arrow_table(cursor, read_parquet(file_path), table, target)
+            else:
+                # COPY parses the CSV itself, so quoted fields with commas (e.g. an address) load intact
+                with open(file_path, "r", encoding="utf-8", newline="") as f:
+                    copy_csv_stream(cursor, f, table, target)
+        return copy
 
-        conn.commit()
+    copies = {}
+    for csv_file, table in tables.items():
+        file_path = os.path.join(csv_path, output_name(csv_file, 'parquet') if parquet else csv_file)
+        print(f"Loading {file_path} into {table}...")
+        copies[table] = copy_file(file_path, table)
 
-    conn.close()
+    counts = load_tables(copies)
     print("All CSVs loaded successfully!")
+    return counts
+
+
+def copy_arrow_table(cursor, arrow_table, table_name: str, target=None):
+    """COPY a typed pyarrow Table into table_name; its columns are already in table order."""
+    if copy_format() == 'binary':
+        copy_binary(cursor, encode_arrow(table_name, arrow_table), table_name, target)
+        return
+
+    columns = ", ".join(arrow_table.column_names)
+    cursor.copy_expert(f"COPY {target or table_name} ({columns}) FROM STDIN WITH (FORMAT csv)",
+                       arrow_to_csv(arrow_table))
 
 
-def download_csv_from_s3_to_dataframe(bucket_name: str, s3_key: str) -> pd.DataFrame:
-    """Download CSV from S3 and return as pandas DataFrame."""
+def download_parquet_from_s3(bucket_name: str, s3_key: str):
+    """Download a Parquet file from S3 and return it as a pyarrow Table."""
     s3_client = get_s3_client()
-    
+
     try:
         response = s3_client.get_object(Bucket=bucket_name, Key=s3_key)
-        csv_content = response['Body'].read().decode('utf-8')
-        df = pd.read_csv(StringIO(csv_content))
-        return df
+        return read_parquet(response['Body'].read())
     except Exception as e:
         print(f"Failed to download {s3_key} from S3: {e}")
         raise
 
 
-def insert_dataframe_to_postgres(df: pd.DataFrame, table_name: str, conn):
-    """Insert DataFrame data into PostgreSQL table."""
-    with conn.cursor() as cursor:
-        # Truncate table
-        print(f'Truncating {table_name}')
-        cursor.execute(f'TRUNCATE TABLE {table_name};')
-        
-        # Convert DataFrame to CSV string for COPY command
-        csv_buffer = StringIO()
-        df.to_csv(csv_buffer, index=False, header=False, na_rep='')
-        csv_buffer.seek(0)
-        
-        # Use COPY to insert data
-        print(f"Loading data into {table_name}...")
-        cursor.copy_from(csv_buffer, table_name, sep=",", null="")
-        print(f'Data saved to {table_name}')
+def copy_csv_stream(cursor, csv_file, table_name: str, target=None):
+    """COPY a CSV file-like object with a header row into table_name, reading COPY_CHUNK_SIZE at a time."""
+    columns = ", ".join(column for column, _ in COLUMNS[table_name])
+    cursor.copy_expert(f"COPY {target or table_name} ({columns}) FROM STDIN WITH (FORMAT csv, HEADER true)",
+                       csv_file, size=COPY_CHUNK_SIZE)
+
+
+def copy_rows(cursor, rows, col_names, table_name: str, target=None):
+    """COPY parsed rows (dicts keyed by col_names, or sequences) from memory into table_name."""
+    rows = ([row.get(name) for name in col_names] if isinstance(row, dict) else row for row in rows)
+    if copy_format() == 'binary':
+        copy_binary(cursor, encode_rows(table_name, rows), table_name, target)
+        return
+
+    buffer = StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+
+    columns = ", ".join(column for column, _ in COLUMNS[table_name])
+    cursor.copy_expert(f"COPY {target or table_name} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def insert_tables_to_db(tables):
+    """Load tables parsed in this run straight into PostgreSQL, in one transaction.
+
+    tables maps each table's output file name (e.g. 'csv_files/ChelseaMatches.csv')
+    to its (spec, rows); only these tables are truncated and reloaded.
+    """
+    def copy_parsed(rows, col_names, table_name):
+        return lambda cursor, target: copy_rows(cursor, rows, col_names, table_name, target)
+
+    copies = {}
+    for file_name, (spec, rows) in tables.items():
+        table_name = table_for_file(file_name)
+        print(f"Loading {len(rows)} parsed rows into {table_name}...")
+        copies[table_name] = copy_parsed(rows, spec.col_names, table_name)
+
+    counts = load_tables(copies)
+    print("All parsed tables loaded successfully into PostgreSQL!")
+    return counts
+
+
+def copy_from_s3(bucket_name: str, s3_key: str, table_name: str):
+    """Return a copy(cursor, target) that streams s3_key's table (CSV or Parquet per PARSE_OUTPUT_FORMAT) into COPY.
+
+    A CSV object's body is handed to COPY as it is read from S3, one chunk at a
+    time, so neither pandas nor a full copy of the table is held in memory.
+    """
+    def copy(cursor, target):
+        if output_format() == 'parquet':
+            copy_arrow_table(cursor, download_parquet_from_s3(bucket_name, output_name(s3_key, 'parquet')),
+                             table_name, target)
+            return
+
+        try:
+            body = get_s3_client().get_object(Bucket=bucket_name, Key=s3_key)['Body']
+        except Exception as e:
+            print(f"Failed to download {s3_key} from S3: {e}")
+            raise
+        try:
+            copy_csv_stream(cursor, body, table_name, target)
+        finally:
+            body.close()
+    return copy
 
 
 def insert_data_to_db_from_s3():
     """Load data from S3 CSVs into PostgreSQL database."""
     load_dotenv()
     bucket_name = ENV['BUCKET_NAME']
-    
-    conn = connect_to_postgres()
 
     # Map S3 CSV keys to table names
     s3_csv_to_tables = {
@@ -113,25 +494,11 @@ def insert_data_to_db_from_s3():
         "csv_files/ChelseaTeamDetails.csv": "chelsea_team_details"
     }
 
-    try:
-        for s3_key, table_name in s3_csv_to_tables.items():
-            print(f"Processing {s3_key} -> {table_name}")
-            
-            # Download CSV from S3 as DataFrame
-            df = download_csv_from_s3_to_dataframe(bucket_name, s3_key)
-            
-            # Insert DataFrame into PostgreSQL
-            insert_dataframe_to_postgres(df, table_name, conn)
-
-        conn.commit()
-        print("All CSVs from S3 loaded successfully into PostgreSQL!")
-        
-    except Exception as e:
-        conn.rollback()
-        print(f"Error occurred: {e}")
-        raise
-    finally:
-        conn.close()
+    # Each object is streamed from S3 straight into COPY, on one connection or LOAD_WORKERS of them
+    counts = load_tables({table_name: copy_from_s3(bucket_name, s3_key, table_name)
+                          for s3_key, table_name in s3_csv_to_tables.items()})
+    print("All CSVs from S3 loaded successfully into PostgreSQL!")
+    return counts
 
 
 if __name__ == '__main__':
@@ -0,0 +1,95 @@
+"""Per-table throughput of each load, kept in the pipeline_runs ledger.
+
+load_data measures every table it loads: the rows and bytes sent by COPY, how
+long the COPY took, and how long the load waited for its lock on the live
+table. At the end of a run the measurements are printed as one JSON line and
+appended to pipeline_runs (see database/schema.sql), one row per table.
+"""
+
+import json
+import time
+import uuid
+
+LEDGER_TABLE = "pipeline_runs"
+LEDGER_COLUMNS = ('run_id', 'table_name', 'load_mode', 'copy_format', 'load_workers', 'rows', 'bytes',
+                  'copy_seconds', 'rows_per_second', 'lock_wait_seconds')
+
+
+class TableMetrics:
+    """What loading one table cost; COPY and lock waits add to it as they happen."""
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+        self.rows = 0
+        self.bytes = 0
+        self.copy_seconds = 0.0
+        self.lock_wait_seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.copy_seconds if self.copy_seconds else None
+
+    def as_dict(self):
+        return {'table_name': self.table_name, 'rows': self.rows, 'bytes': self.bytes,
+                'copy_seconds': round(self.copy_seconds, 6),
+                'rows_per_second': None if self.rows_per_second is None else round(self.rows_per_second, 1),
+                'lock_wait_seconds': round(self.lock_wait_seconds, 6)}
+
+
+class _CountingReader:
+    """A read()-able wrapper that counts the bytes COPY pulls through it."""
+
+    def __init__(self, f):
+        self.f = f
+        self.bytes = 0
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.bytes += len(data.encode('utf-8')) if isinstance(data, str) else len(data)
+        return data
+
+
+class CopyMeter:
+    """Cursor wrapper that times each copy_expert and adds its rows and bytes to metrics."""
+
+    def __init__(self, cursor, metrics):
+        self.cursor = cursor
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def copy_expert(self, sql, file, size=8192):
+        counted = _CountingReader(file)
+        started = time.perf_counter()
+        self.cursor.copy_expert(sql, counted, size=size)
+        self.metrics.copy_seconds += time.perf_counter() - started
+        self.metrics.bytes += counted.bytes
+        self.metrics.rows += max(int(self.cursor.rowcount), 0)
+
+
+def metered(cursor, metrics):
+    """Return cursor wrapped to record its COPYs into metrics, or cursor itself if metrics is None."""
+    return cursor if metrics is None else CopyMeter(cursor, metrics)
+
+
+def new_run_id():
+    return str(uuid.uuid4())
+
+
+def run_summary(run_id, settings, metrics):
+    """Return a run's measurements as JSON-ready rows, one per table, with settings (mode, format, workers)."""
+    return [dict({'run_id': run_id}, **settings, **table.as_dict()) for table in metrics.values()]
+
+
+def emit_run(summary):
+    """Print the run's measurements as one JSON line, for log-based metrics."""
+    print(json.dumps({'event': 'load_metrics', 'tables': summary}, sort_keys=True))
+
+
+def record_run(cursor, summary):
+    """Append the run's rows to the pipeline_runs ledger; the caller commits."""
+    columns = ", ".join(LEDGER_COLUMNS)
+    placeholders = ", ".join(["%s"] * len(LEDGER_COLUMNS))
+    cursor.executemany(f"INSERT INTO {LEDGER_TABLE} ({columns}) VALUES ({placeholders});",
+                       [tuple(row[column] for column in LEDGER_COLUMNS) for row in summary])
@@ -0,0 +1,70 @@
+"""Manifest of what each local parse stage last read and wrote.
+
+For every stage it records the sha256 of each raw input file and the size of
+each output file. A stage whose inputs hash the same and whose outputs are
+still in place does not need to run again, and its tables need no reload.
+"""
+
+import hashlib
+import json
+import os
+
+from raw_storage import find_raw_file
+
+MANIFEST_FILE = ".parse_manifest.json"
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    """Return the sha256 hex digest of the file at path."""
+    digest = hashlib.sha256()
+    with open(path, mode='rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def input_digests(json_path, names):
+    """Return {name: digest} for the stored variant of each raw file, None where one is missing."""
+    digests = {}
+    for name in names:
+        try:
+            digests[name] = file_digest(find_raw_file(json_path, name))
+        except FileNotFoundError:
+            digests[name] = None
+    return digests
+
+
+def load_manifest(path):
+    """Return the parse manifest stored in path, or {} if none."""
+    file_name = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(file_name):
+        return {}
+    with open(file_name, mode='r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path):
+    """Write the parse manifest next to the parsed files in path."""
+    with open(os.path.join(path, MANIFEST_FILE), mode='w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def stage_is_current(manifest, stage, digests, path):
+    """Return whether stage already parsed exactly these inputs and its outputs are untouched."""
+    entry = manifest.get(stage)
+    if not entry or entry['inputs'] != digests or None in digests.values():
+        return False
+    for name, size in entry['outputs'].items():
+        output = os.path.join(path, name)
+        if not os.path.exists(output) or os.path.getsize(output) != size:
+            return False
+    return True
+
+
+def record_stage(manifest, stage, digests, path, outputs):
+    """Record that stage turned inputs with these digests into the named output files in path."""
+    manifest[stage] = {
+        'inputs': digests,
+        'outputs': {name: os.path.getsize(os.path.join(path, name)) for name in outputs},
+    }
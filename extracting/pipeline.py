@@ -1,28 +1,95 @@
 """File that holds the main lambda handler function for the cloud pipeline."""
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from dotenv import load_dotenv
 from os import environ as ENV
 
-from extract_data import ingest_data_to_s3
-from parse_data_cloud import parse_comp_standings_s3, parse_league_details_s3, parse_matches_s3, parse_team_details_s3
-from load_data import insert_data_to_db_from_s3
+from extract_data import extract_endpoints, ingest_data_to_s3, load_validators_s3, save_validators_s3
+from parse_data_cloud import (parse_comp_standings_s3, parse_league_details_s3, parse_matches_s3,
+                              parse_team_details_s3, upload_rows_to_s3)
+from load_data import insert_data_to_db_from_s3, insert_tables_to_db
+from job_spec import load_job_spec, expand_jobs, require_files
+from helperFunction import StageError, runConcurrently
+
+
+def load_parsed_tables(tables, bucket_name, persist=True):
+    """COPY this run's parsed tables straight into Postgres, writing them to S3 alongside.
+
+    The S3 uploads run in the background while the database load runs, and are
+    waited for before returning, since Lambda freezes the process once the
+    handler returns. Upload failures are raised together as a StageError.
+    """
+    if not tables:
+        print("No table parsed, skipping load")
+        return
+
+    with ThreadPoolExecutor(max_workers=len(tables)) as side_writes:
+        uploads = {}
+        if persist:
+            uploads = {s3_filename: side_writes.submit(upload_rows_to_s3, spec, rows, bucket_name, s3_filename)
+                       for s3_filename, (spec, rows) in tables.items()}
+
+        insert_tables_to_db(tables)
+
+        errors = {}
+        for s3_filename, upload in uploads.items():
+            try:
+                upload.result()
+            except Exception as error:
+                print('Upload of {} failed: {}'.format(s3_filename, error))
+                errors[s3_filename] = error
+    if errors:
+        raise StageError(errors)
+
 
 def run_full_cloud_pipeline():
     base_url = ENV['API_URL']
     api_key = ENV['API_KEY']
     bucket_name = ENV['BUCKET_NAME']
-    ingest_data_to_s3(base_url, api_key, bucket_name, 'v4/teams/61/matches/', "json_files/ChelseaMatches.json")
-    ingest_data_to_s3(base_url, api_key, bucket_name, 'v4/teams/61', "json_files/ChelseaTeamDetails.json")
-    ingest_data_to_s3(base_url, api_key, bucket_name, 'v4/competitions/2021/standings', "json_files/PremierLeagueStandings.json")
-    ingest_data_to_s3(base_url, api_key, bucket_name, 'v4/competitions/2001/standings', "json_files/ChampionsLeagueStandings.json")
-
-    parse_matches_s3(bucket_name)
-    parse_team_details_s3(bucket_name)
-    parse_league_details_s3(bucket_name)
-    parse_comp_standings_s3(bucket_name, 'Champions')
-    parse_comp_standings_s3(bucket_name, 'Premier')
-
-    insert_data_to_db_from_s3()
+    endpoints = [(api_name, "json_files/" + f_name) for api_name, f_name in expand_jobs(load_job_spec())]
+    # Direct mode hands parsed tables to the loader in memory instead of round-tripping them through S3
+    direct = ENV.get('DIRECT_LOAD', 'false').lower() == 'true'
+
+    # (input JSON keys, parse function, arguments) — a stage only runs if one of its inputs changed
+    parse_stages = [
+        (["json_files/ChelseaMatches.json"], parse_matches_s3, (bucket_name,)),
+        (["json_files/ChelseaTeamDetails.json"], parse_team_details_s3, (bucket_name,)),
+        (["json_files/PremierLeagueStandings.json", "json_files/ChampionsLeagueStandings.json"],
+         parse_league_details_s3, (bucket_name,)),
+        (["json_files/ChampionsLeagueStandings.json"], parse_comp_standings_s3, (bucket_name, 'Champions')),
+        (["json_files/PremierLeagueStandings.json"], parse_comp_standings_s3, (bucket_name, 'Premier')),
+    ]
+    # Checked before fetching, so a spec that drops one of these fails instead of reloading stale tables
+    require_files(endpoints, [s3_key for inputs, _, _ in parse_stages for s3_key in inputs])
+
+    validators = load_validators_s3(bucket_name)
+    changed = extract_endpoints(ingest_data_to_s3, base_url, api_key, bucket_name, endpoints,
+                                validators=validators)
+
+    parse_tasks = {}
+    for inputs, parse, args in parse_stages:
+        if any(changed.get(s3_key) for s3_key in inputs):
+            parse_tasks["parse " + ", ".join(inputs)] = (partial(parse, upload=False) if direct else parse, args)
+        else:
+            print("{} unchanged, skipping parse".format(", ".join(inputs)))
+
+    # The stages are independent and mostly wait on S3, so they run on a thread pool (Lambda has no
+    # /dev/shm for a process pool); failures are collected into one StageError
+    parsed = runConcurrently(parse_tasks, max_workers=int(ENV.get('PARSE_WORKERS', len(parse_tasks) or 1)))
+
+    if direct:
+        tables = {}
+        for stage_tables in parsed.values():
+            tables.update(stage_tables)
+        load_parsed_tables(tables, bucket_name, persist=ENV.get('PERSIST_PARSED', 'true').lower() == 'true')
+    elif any(changed.values()):
+        insert_data_to_db_from_s3()
+    else:
+        print("No endpoint changed, skipping load")
+
+    # Only remember the new validators once everything downstream has succeeded
+    save_validators_s3(validators, bucket_name)
 
 
 def lambda_handler(event, context):  # pylint: disable=W0613
@@ -4,9 +4,13 @@ from dotenv import load_dotenv
 from os import environ as ENV
 import os
 
-from extract_data import ingest_data
-from parse_data import parse_comp_standings, parse_league_details, parse_matches, parse_team_details
+from extract_data import extract_endpoints, ingest_data, load_validators, save_validators
+from parse_data import parse_comp_standings, parse_league_details, parse_matches, parse_team_details, standings_files
+from parse_manifest import input_digests, load_manifest, record_stage, save_manifest, stage_is_current
 from load_data import insert_data_to_db
+from columnar import output_name
+from helperFunction import runConcurrently
+from job_spec import expand_jobs, load_job_spec, require_files
 
 def run_full_local_pipeline():
     base_url = ENV['API_URL']
@@ -18,18 +22,55 @@ def run_full_local_pipeline():
     os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
     "csv_files")
 
-    ingest_data(base_url, api_key, json_path, 'v4/teams/61/matches/', "ChelseaMatches.json")
-    ingest_data(base_url, api_key, json_path, 'v4/teams/61', "ChelseaTeamDetails.json")
-    ingest_data(base_url, api_key, json_path, 'v4/competitions/2021/standings', "PremierLeagueStandings.json")
-    ingest_data(base_url, api_key, json_path, 'v4/competitions/2001/standings', "ChampionsLeagueStandings.json")
+    # (stage, input JSON files, output tables, parse function, arguments) — a stage only runs if the
+    # manifest shows its inputs' content changed since it last ran, or its outputs have gone
+    parse_stages = [
+        ("matches", ["ChelseaMatches.json"], ["ChelseaMatches.csv"], parse_matches, (json_path, csv_path)),
+        ("team_details", ["ChelseaTeamDetails.json"], ["ChelseaTeamDetails.csv", "ChelseaPlayers.csv"],
+         parse_team_details, (json_path, csv_path)),
+        ("champions_standings", ["ChampionsLeagueStandings.json"], ["ChampionsLeagueStandings.csv"],
+         parse_comp_standings, (json_path, csv_path, 'Champions')),
+        ("premier_standings", ["PremierLeagueStandings.json"], ["PremierLeagueStandings.csv"],
+         parse_comp_standings, (json_path, csv_path, 'Premier')),
+    ]
+    # Checked before fetching, so a spec that drops one of these fails instead of parsing a stale copy
+    endpoints = expand_jobs(load_job_spec())
+    require_files(endpoints, [f_name for _, inputs, _, _, _ in parse_stages for f_name in inputs])
 
-    parse_matches(json_path, csv_path)
-    parse_team_details(json_path, csv_path)
-    parse_league_details(json_path, csv_path)
-    parse_comp_standings(json_path, csv_path, 'Champions')
-    parse_comp_standings(json_path, csv_path, 'Premier')
+    validators = load_validators(json_path)
+    extract_endpoints(ingest_data, base_url, api_key, json_path, endpoints, validators=validators)
 
-    insert_data_to_db()
+    # league_details reads whichever standings files there are, so its inputs are only known now
+    parse_stages.insert(2, ("league_details", standings_files(json_path), ["CompetitionDetails.csv"],
+                            parse_league_details, (json_path, csv_path)))
+
+    manifest = load_manifest(csv_path)
+    parse_tasks = {}
+    pending = {}
+    for stage, inputs, outputs, parse, args in parse_stages:
+        digests = input_digests(json_path, inputs)
+        if stage_is_current(manifest, stage, digests, csv_path):
+            print("{} unchanged, skipping parse".format(", ".join(inputs)))
+        else:
+            parse_tasks[stage] = (parse, args)
+            pending[stage] = (digests, outputs)
+
+    # The stages are independent and CPU-bound (JSON decoding), so they run in a process pool;
+    # failures are collected into one StageError
+    runConcurrently(parse_tasks, max_workers=int(ENV.get('PARSE_WORKERS', os.cpu_count() or 1)), processes=True)
+
+    changed_tables = [table for _, outputs in pending.values() for table in outputs]
+    if changed_tables:
+        insert_data_to_db(tables=changed_tables)
+    else:
+        print("No parsed table changed, skipping load")
+
+    for stage, (digests, outputs) in pending.items():
+        record_stage(manifest, stage, digests, csv_path, [output_name(table) for table in outputs])
+    save_manifest(manifest, csv_path)
+
+    # Only remember the new validators once everything downstream has succeeded
+    save_validators(validators, json_path)
 
 
 
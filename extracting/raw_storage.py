@@ -0,0 +1,122 @@
+"""Optional gzip / zstd compression for the raw JSON layer (json_files/ locally and in S3).
+
+Writers pick the format from RAW_COMPRESSION ('none', 'gzip' or 'zstd') and add
+a .gz / .zst suffix to the file name. Readers never need to know the format:
+compressed payloads are recognised by their magic bytes and decoded on the fly.
+"""
+
+import gzip
+import io
+import os
+from contextlib import contextmanager
+from os import environ as ENV
+
+try:
+    import zstandard
+except ImportError:  # zstd support is optional
+    zstandard = None
+
+SUFFIXES = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+CONTENT_TYPES = {'none': 'application/json', 'gzip': 'application/gzip', 'zstd': 'application/zstd'}
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def raw_compression(compression=None):
+    """Return the compression to write with, defaulting to RAW_COMPRESSION."""
+    if compression is None:
+        compression = ENV.get('RAW_COMPRESSION', 'none')
+    if compression not in SUFFIXES:
+        raise ValueError("Unknown raw compression {!r}, expected one of {}".format(compression, list(SUFFIXES)))
+    if compression == 'zstd' and zstandard is None:
+        raise ImportError("RAW_COMPRESSION=zstd needs the zstandard package")
+    return compression
+
+
+def stored_name(name, compression=None):
+    """Return the file name / S3 key name is stored under with compression."""
+    return name + SUFFIXES[raw_compression(compression)]
+
+
+def logical_name(name):
+    """Strip any compression suffix from a stored file name or S3 key."""
+    for suffix in SUFFIXES.values():
+        if suffix and name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def candidate_names(name):
+    """Every stored name a logical name may have, the configured format first."""
+    preferred = stored_name(name)
+    return [preferred] + [name + suffix for suffix in SUFFIXES.values() if name + suffix != preferred]
+
+
+@contextmanager
+def compressing_writer(f, compression=None):
+    """Wrap binary file f so bytes written to the result are compressed with compression."""
+    compression = raw_compression(compression)
+    if compression == 'gzip':
+        with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=6, mtime=0) as writer:
+            yield writer
+    elif compression == 'zstd':
+        with zstandard.ZstdCompressor(level=3).stream_writer(f, closefd=False) as writer:
+            yield writer
+    else:
+        yield f
+
+
+def decompress_bytes(data):
+    """Decode a whole raw payload, whichever format it was stored in."""
+    if data.startswith(GZIP_MAGIC):
+        return gzip.decompress(data)
+    if data.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise ImportError("Reading zstd-compressed JSON needs the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=1 << 31)
+    return data
+
+
+def find_raw_file(json_path, name):
+    """Return the path of the newest stored variant of name in json_path."""
+    paths = [os.path.join(json_path, candidate) for candidate in candidate_names(name)]
+    existing = [path for path in paths if os.path.exists(path)]
+    if not existing:
+        raise FileNotFoundError("No raw file for {} in {}".format(name, json_path))
+    return max(existing, key=os.path.getmtime)
+
+
+def find_raw_object(s3_client, bucket_name, name):
+    """Return the key of the newest stored variant of name in bucket_name, or None if there is none."""
+    candidates = candidate_names(name)
+    response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=name)
+    existing = [obj for obj in response.get('Contents', []) if obj['Key'] in candidates]
+    if not existing:
+        return None
+    return max(existing, key=lambda obj: obj['LastModified'])['Key']
+
+
+def open_raw_text(path):
+    """Open a raw JSON file for reading as text, decompressing it if needed."""
+    with open(path, mode='rb') as f:
+        magic = f.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.open(path, mode='rt', encoding='utf-8')
+    if magic.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise ImportError("Reading zstd-compressed JSON needs the zstandard package")
+        return zstandard.open(path, mode='rt', encoding='utf-8')
+    return open(path, mode='r', encoding='utf-8')
+
+
+def open_raw_stream(raw):
+    """Wrap a binary stream of a raw payload, such as an S3 object's body, for reading as text, decompressing it if needed."""
+    buffered = io.BufferedReader(raw)
+    magic = buffered.peek(4)[:4]
+    if magic.startswith(GZIP_MAGIC):
+        return io.TextIOWrapper(gzip.GzipFile(fileobj=buffered, mode='rb'), encoding='utf-8')
+    if magic.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise ImportError("Reading zstd-compressed JSON needs the zstandard package")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(buffered), encoding='utf-8')
+    return io.TextIOWrapper(buffered, encoding='utf-8')
@@ -0,0 +1,172 @@
+"""Local stand-in for the football-data API that replays recorded JSON fixtures.
+
+Point API_URL at the server (for example http://127.0.0.1:8080/) to run
+extraction, or the whole local pipeline, without network access. Latency and
+error responses can be injected to measure retry and rate-limit behaviour
+deterministically.
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from job_spec import expand_jobs, load_job_spec
+from raw_storage import decompress_bytes, find_raw_file
+
+
+def default_routes():
+    """Map each API path in the job spec to the fixture file it is recorded in."""
+    return {api_name: f_name for api_name, f_name in expand_jobs(load_job_spec())}
+
+
+class ReplayServer:
+    """Serves fixtures_dir over HTTP, as the API would.
+
+    routes maps API paths (as in the job spec) to fixture file names. Each
+    response is delayed by latency seconds. errors lists status codes served,
+    in order, to the first requests for each path before the fixture is
+    returned, e.g. [429, 503]. 429s carry Retry-After: retry_after.
+    Responses carry an ETag and honour If-None-Match with a 304.
+    """
+
+    def __init__(self, fixtures_dir, routes=None, latency=0.0, errors=(), retry_after=1, host='127.0.0.1', port=0):
+        self.fixtures_dir = fixtures_dir
+        self.routes = {self.normalise(path): f_name for path, f_name in (routes or default_routes()).items()}
+        self.latency = latency
+        self.errors = list(errors)
+        self.retry_after = retry_after
+        self.attempts = {}
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self.handler())
+        self.thread = None
+
+    @staticmethod
+    def normalise(path):
+        path, _, query = path.lstrip('/').partition('?')
+        return path.rstrip('/') + ('?' + query if query else '')
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://{}:{}/'.format(host, port)
+
+    def next_error(self, path):
+        """Return the injected status for this request to path, or None to serve the fixture."""
+        with self.lock:
+            attempt = self.attempts.get(path, 0)
+            self.attempts[path] = attempt + 1
+        return self.errors[attempt] if attempt < len(self.errors) else None
+
+    def handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                path = server.normalise(self.path)
+                f_name = server.routes.get(path)
+                if f_name is None:
+                    return self.reply(404, b'{"message": "No fixture for this path"}')
+
+                status = server.next_error(path)
+                if status == 429:
+                    return self.reply(429, b'{"message": "Too many requests"}', {
+                        'Retry-After': str(server.retry_after),
+                        'X-Requests-Available-Minute': '0',
+                        'X-RequestCounter-Reset': str(server.retry_after),
+                    })
+                if status is not None:
+                    return self.reply(status, b'{"message": "Injected error"}')
+
+                try:
+                    with open(find_raw_file(server.fixtures_dir, f_name), mode='rb') as f:
+                        body = decompress_bytes(f.read())
+                except FileNotFoundError:
+                    return self.reply(404, b'{"message": "Fixture file missing"}')
+                etag = '"{}"'.format(hashlib.sha256(body).hexdigest())
+                if self.headers.get('If-None-Match') == etag:
+                    return self.reply(304, b'', {'ETag': etag})
+                self.reply(200, body, {'ETag': etag, 'X-Requests-Available-Minute': '1000',
+                                       'X-RequestCounter-Reset': '60'})
+
+            def reply(self, status, body, headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """Serve in a background thread and return the base URL."""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self.url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def benchmark(server, runs=5):
+    """Time extract_endpoints against server and return the wall time of each run in seconds."""
+    from extract_data import extract_endpoints, ingest_data
+
+    timings = []
+    out_dir = tempfile.mkdtemp()
+    try:
+        for _ in range(runs):
+            with server.lock:
+                server.attempts.clear()
+            started = time.perf_counter()
+            extract_endpoints(ingest_data, server.url, 'replay', out_dir)
+            timings.append(time.perf_counter() - started)
+    finally:
+        shutil.rmtree(out_dir)
+    return timings
+
+
+if __name__ == '__main__':
+    fixtures_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "json_files")
+
+    parser = argparse.ArgumentParser(description="Replay recorded API responses locally.")
+    parser.add_argument('--fixtures', default=fixtures_dir, help="directory of recorded JSON files")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--errors', type=int, nargs='*', default=[],
+                        help="status codes served to the first requests for each path, e.g. 429 503")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument('--bench', type=int, default=0, metavar='RUNS',
+                        help="time RUNS extractions against the server instead of serving")
+    args = parser.parse_args()
+
+    server = ReplayServer(args.fixtures, latency=args.latency, errors=args.errors,
+                          retry_after=args.retry_after, port=args.port)
+    if args.bench:
+        with server:
+            timings = benchmark(server, args.bench)
+        print("runs={} min={:.3f}s mean={:.3f}s max={:.3f}s".format(
+            len(timings), min(timings), sum(timings) / len(timings), max(timings)))
+    else:
+        print("Replaying {} on {}".format(args.fixtures, server.url))
+        server.httpd.serve_forever()
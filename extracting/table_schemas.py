@@ -0,0 +1,72 @@
+"""Column types and primary keys of the raw tables, mirroring database/schema.sql.
+
+Kept in Python because schema.sql is not shipped in the Lambda image;
+test_table_schemas.py checks the two stay in step.
+"""
+
+# Output file stem -> table it is loaded into
+FILE_TABLES = {
+    "ChampionsLeagueStandings": "champions_league_standings",
+    "PremierLeagueStandings": "premier_league_standings",
+    "ChelseaMatches": "chelsea_matches",
+    "ChelseaPlayers": "chelsea_players",
+    "CompetitionDetails": "competition_details",
+    "ChelseaTeamDetails": "chelsea_team_details",
+}
+
+_STANDINGS_COLUMNS = [
+    ('position', 'INT'), ('team_id', 'INT'), ('team_name', 'TEXT'), ('team_shortname', 'TEXT'),
+    ('team_tla', 'TEXT'), ('team_crest', 'TEXT'), ('played_games', 'INT'), ('form', 'TEXT'),
+    ('won', 'INT'), ('draw', 'INT'), ('lost', 'INT'), ('points', 'INT'), ('goals_for', 'INT'),
+    ('goals_against', 'INT'), ('goal_difference', 'INT'),
+]
+
+# Table -> ordered (column, type) pairs
+COLUMNS = {
+    "chelsea_matches": [
+        ('area_name', 'TEXT'), ('competition_id', 'INT'), ('competition_name', 'TEXT'), ('season_id', 'INT'),
+        ('season_startdate', 'DATE'), ('season_enddate', 'DATE'), ('current_matchday', 'INT'),
+        ('match_id', 'BIGINT'), ('match_date', 'DATE'), ('status', 'TEXT'), ('stage', 'TEXT'),
+        ('comp_group', 'TEXT'), ('home_team_name', 'TEXT'), ('home_team_id', 'INT'), ('home_team_tla', 'TEXT'),
+        ('home_team_crest', 'TEXT'), ('away_team_name', 'TEXT'), ('away_team_id', 'INT'),
+        ('away_team_tla', 'TEXT'), ('away_team_crest', 'TEXT'), ('winner', 'TEXT'), ('duration', 'TEXT'),
+        ('fulltime_away', 'INT'), ('fulltime_home', 'INT'), ('halftime_away', 'INT'), ('halftime_home', 'INT'),
+        ('referee_name', 'TEXT'), ('referee_nationality', 'TEXT'),
+    ],
+    "chelsea_team_details": [
+        ('area_id', 'INT'), ('area_name', 'TEXT'), ('area_code', 'TEXT'), ('area_flag', 'TEXT'),
+        ('team_id', 'INT'), ('team_name', 'TEXT'), ('team_shortname', 'TEXT'), ('team_tla', 'TEXT'),
+        ('team_crest', 'TEXT'), ('address', 'TEXT'), ('website', 'TEXT'), ('founded', 'INT'),
+        ('club_colors', 'TEXT'), ('venue', 'TEXT'), ('coach_id', 'INT'), ('coach_firstname', 'TEXT'),
+        ('coach_lastname', 'TEXT'), ('coach_name', 'TEXT'), ('coach_dob', 'DATE'),
+        ('coach_nationality', 'TEXT'), ('coach_contract_start', 'TEXT'), ('coach_contract_until', 'TEXT'),
+    ],
+    "chelsea_players": [
+        ('player_id', 'INT'), ('player_name', 'TEXT'), ('player_position', 'TEXT'), ('player_dob', 'DATE'),
+        ('player_nationality', 'TEXT'),
+    ],
+    "competition_details": [
+        ('season', 'TEXT'), ('area_id', 'INT'), ('area_name', 'TEXT'), ('area_code', 'TEXT'),
+        ('area_flag', 'TEXT'), ('competition_id', 'INT'), ('competition_name', 'TEXT'),
+        ('competition_code', 'TEXT'), ('competition_type', 'TEXT'), ('competition_emblem', 'TEXT'),
+        ('season_id', 'INT'), ('season_startdate', 'DATE'), ('season_enddate', 'DATE'),
+        ('current_matchday', 'INT'), ('season_winner', 'TEXT'), ('stage', 'TEXT'), ('standings_type', 'TEXT'),
+        ('comp_group', 'TEXT'),
+    ],
+    "premier_league_standings": _STANDINGS_COLUMNS,
+    "champions_league_standings": _STANDINGS_COLUMNS,
+}
+
+PRIMARY_KEYS = {
+    "chelsea_matches": ['match_id'],
+    "chelsea_team_details": ['team_id'],
+    "chelsea_players": ['player_id'],
+    "competition_details": ['competition_id'],
+    "premier_league_standings": ['position', 'team_id'],
+    "champions_league_standings": ['position', 'team_id'],
+}
+
+
+def table_for_file(file_name):
+    """Return the table an output file (e.g. ChelseaMatches.csv or .parquet) is loaded into."""
+    return FILE_TABLES[file_name.rsplit('.', 1)[0].rsplit('/', 1)[-1]]
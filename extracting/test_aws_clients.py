@@ -0,0 +1,37 @@
+import pytest
+from unittest.mock import patch
+
+import aws_clients
+
+
+@pytest.fixture(autouse=True)
+def fresh_client(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY", "fake_access")
+    monkeypatch.setenv("AWS_SECRET_KEY", "fake_secret")
+    aws_clients.reset_s3_client()
+    yield
+    aws_clients.reset_s3_client()
+
+
+def test_get_s3_client_is_created_once():
+    """Every caller shares one client instead of building a new one per call."""
+    with patch("aws_clients.boto3.client") as mock_client:
+        first = aws_clients.get_s3_client()
+        second = aws_clients.get_s3_client()
+
+    assert first is second
+    mock_client.assert_called_once()
+
+
+def test_get_s3_client_pool_size_is_configurable(monkeypatch):
+    monkeypatch.setenv("S3_MAX_POOL_CONNECTIONS", "5")
+    client = aws_clients.get_s3_client()
+
+    assert client.meta.config.max_pool_connections == 5
+
+
+def test_reset_s3_client_builds_a_new_client():
+    first = aws_clients.get_s3_client()
+    aws_clients.reset_s3_client()
+
+    assert aws_clients.get_s3_client() is not first
@@ -0,0 +1,82 @@
+import json
+import pytest
+from unittest.mock import MagicMock
+
+import backfill
+from helperFunction import StageError
+
+
+@pytest.fixture(autouse=True)
+def set_env(monkeypatch):
+    monkeypatch.setenv("API_URL", "https://fake.api/")
+    monkeypatch.setenv("API_KEY", "testkey")
+
+
+def test_season_windows_cover_the_season_without_gaps():
+    """Windows run from 1 July to 30 June, each starting the day after the last ended."""
+    windows = backfill.season_windows(2023, window_days=30)
+
+    assert windows[0] == ("2023-07-01", "2023-07-30")
+    assert windows[-1][1] == "2024-06-30"
+    assert len(windows) == 13
+
+
+def test_backfill_jobs_builds_windowed_requests():
+    spec = {"teams": [{"id": 61, "name": "Chelsea"}]}
+    jobs = backfill.backfill_jobs(spec, [2022], window_days=366)
+
+    assert jobs == [(
+        "v4/teams/61/matches/?season=2022&dateFrom=2022-07-01&dateTo=2023-06-30",
+        "backfill/ChelseaMatches_2022_2022-07-01_2023-06-30.json",
+    )]
+
+
+def test_run_backfill_resumes_from_checkpoint(tmp_path, monkeypatch):
+    """An interrupted backfill only refetches the windows that did not complete."""
+    monkeypatch.setattr(backfill, "load_job_spec", lambda: {"teams": [{"id": 61, "name": "Chelsea"}]})
+    checkpoint = str(tmp_path / "checkpoint.json")
+    calls = []
+
+    def flaky_ingest(url, key, target, api_name, f_name):
+        calls.append(f_name)
+        if "dateFrom=2023-10" in api_name:
+            raise Exception("API Error")
+
+    monkeypatch.setattr(backfill, "ingest_data", flaky_ingest)
+    with pytest.raises(StageError):
+        backfill.run_backfill([2023], str(tmp_path), checkpoint, window_days=31)
+    assert len(calls) == 12
+    assert len(json.loads(open(checkpoint).read())) == 11
+
+    resumed = MagicMock()
+    monkeypatch.setattr(backfill, "ingest_data", resumed)
+    backfill.run_backfill([2023], str(tmp_path), checkpoint, window_days=31)
+
+    assert resumed.call_count == 1
+    assert "dateFrom=2023-10" in resumed.call_args.args[3]
+    assert len(json.loads(open(checkpoint).read())) == 12
+
+
+def test_run_backfill_to_s3_resumes_from_checkpoint(tmp_path, monkeypatch):
+    """S3 backfills record the bare window names, so a second run skips what the first uploaded."""
+    monkeypatch.setattr(backfill, "load_job_spec", lambda: {"teams": [{"id": 61, "name": "Chelsea"}]})
+    checkpoint = str(tmp_path / "checkpoint.json")
+    calls = []
+
+    def flaky_ingest(url, key, target, api_name, f_name):
+        calls.append(f_name)
+        if "dateFrom=2023-10" in api_name:
+            raise Exception("API Error")
+
+    monkeypatch.setattr(backfill, "ingest_data_to_s3", flaky_ingest)
+    with pytest.raises(StageError):
+        backfill.run_backfill([2023], "bucket", checkpoint, window_days=31, bucket=True)
+    assert all(f_name.startswith("json_files/backfill/") for f_name in calls)
+    assert all(name.startswith("backfill/") for name in json.loads(open(checkpoint).read()))
+
+    resumed = MagicMock()
+    monkeypatch.setattr(backfill, "ingest_data_to_s3", resumed)
+    backfill.run_backfill([2023], "bucket", checkpoint, window_days=31, bucket=True)
+
+    assert resumed.call_count == 1
+    assert resumed.call_args.args[4].startswith("json_files/backfill/ChelseaMatches_2023_2023-10-")
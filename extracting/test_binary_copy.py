@@ -0,0 +1,89 @@
+import struct
+from datetime import date
+
+import pytest
+
+import binary_copy
+
+
+def players_row(**overrides):
+    row = {'PLAYER_ID': 10, 'PLAYER_NAME': 'Player, A', 'PLAYER_POSITION': 'Defence',
+           'PLAYER_DOB': '2000-01-31', 'PLAYER_NATIONALITY': 'England'}
+    row.update(overrides)
+    return list(row.values())
+
+
+def test_encode_rows_writes_header_typed_fields_and_trailer():
+    data = b''.join(binary_copy.encode_rows('chelsea_players', [players_row()]))
+
+    assert data.startswith(binary_copy.HEADER)
+    assert data.endswith(binary_copy.TRAILER)
+    body = data[len(binary_copy.HEADER):-len(binary_copy.TRAILER)]
+    assert body == b''.join([
+        struct.pack('!h', 5),
+        struct.pack('!ii', 4, 10),
+        struct.pack('!i', 9) + b'Player, A',
+        struct.pack('!i', 7) + b'Defence',
+        struct.pack('!ii', 4, (date(2000, 1, 31) - date(2000, 1, 1)).days),
+        struct.pack('!i', 7) + b'England',
+    ])
+
+
+def test_encode_rows_writes_none_and_empty_strings_as_null():
+    data = b''.join(binary_copy.encode_rows('chelsea_players', [players_row(PLAYER_POSITION='', PLAYER_DOB=None)]))
+
+    assert data.count(binary_copy.NULL) == 2
+
+
+def test_date_column_keeps_the_day_of_timestamps():
+    [fields] = binary_copy._date_column(['2024-08-18T15:30:00Z', date(2024, 8, 18), '1999-12-31', None])
+
+    assert fields[0] == fields[1] == struct.pack('!ii', 4, (date(2024, 8, 18) - date(2000, 1, 1)).days)
+    assert fields[2:] == [struct.pack('!ii', 4, -1), binary_copy.NULL]
+
+
+def test_int8_and_text_columns_encode_utf8_length():
+    assert binary_copy._int8_column(['9000000000']) == [[struct.pack('!iq', 8, 9000000000)]]
+    long_text = 'x' * 2000
+    assert binary_copy._text_column(['Enzo Fernández', 7, long_text]) == [
+        [struct.pack('!i', 15), struct.pack('!i', 1), struct.pack('!i', 2000)],
+        ['Enzo Fernández'.encode(), b'7', long_text.encode()]]
+
+
+def test_encode_columns_matches_encode_rows():
+    rows = [players_row(PLAYER_ID=i, PLAYER_DOB=None if i % 3 else '2000-01-31') for i in range(2500)]
+    batches = [list(zip(*rows[:1200])), list(zip(*rows[1200:]))]
+
+    assert (b''.join(binary_copy.encode_columns('chelsea_players', batches))
+            == b''.join(binary_copy.encode_rows('chelsea_players', rows)))
+
+
+def test_encode_arrow_matches_encode_rows():
+    """Typed Parquet columns encode to the same COPY data as the parsed rows they came from."""
+    pytest.importorskip("pyarrow")
+    from columnar import to_arrow
+    from field_mapping import PLAYERS
+
+    rows = [players_row(PLAYER_ID=i, PLAYER_NAME=None if i % 4 else 'Enzo Fernández') for i in range(2500)]
+    table = to_arrow(PLAYERS.file_name, PLAYERS.col_names, rows)
+
+    assert (b''.join(binary_copy.encode_arrow('chelsea_players', table))
+            == b''.join(binary_copy.encode_rows('chelsea_players', rows)))
+
+
+def test_binary_copy_stream_reads_in_requested_sizes():
+    rows = [players_row(PLAYER_ID=i) for i in range(2500)]
+    expected = b''.join(binary_copy.encode_rows('chelsea_players', rows))
+    stream = binary_copy.BinaryCopyStream(binary_copy.encode_rows('chelsea_players', iter(rows)))
+
+    chunks = list(iter(lambda: stream.read(8192), b''))
+
+    assert b''.join(chunks) == expected
+    assert all(len(chunk) == 8192 for chunk in chunks[:-1])
+
+
+def test_binary_copy_stream_of_no_rows_is_header_and_trailer():
+    stream = binary_copy.BinaryCopyStream(binary_copy.encode_rows('chelsea_players', []))
+
+    assert stream.read() == binary_copy.HEADER + binary_copy.TRAILER
+    assert stream.read() == b''
@@ -0,0 +1,74 @@
+import datetime
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+import columnar
+from field_mapping import MATCHES, PLAYERS
+
+
+PLAYER_ROWS = [
+    {'PLAYER_ID': 1, 'PLAYER_NAME': 'Cole Palmer', 'PLAYER_POSITION': 'Midfield',
+     'PLAYER_DOB': '2002-05-06', 'PLAYER_NATIONALITY': 'England'},
+    {'PLAYER_ID': 2, 'PLAYER_NAME': 'Robert, Jr.', 'PLAYER_POSITION': None,
+     'PLAYER_DOB': None, 'PLAYER_NATIONALITY': 'Spain'},
+]
+
+
+def test_output_format_defaults_to_csv(monkeypatch):
+    monkeypatch.delenv("PARSE_OUTPUT_FORMAT", raising=False)
+    assert columnar.output_format() == 'csv'
+    assert columnar.output_name('csv_files/ChelseaPlayers.csv') == 'csv_files/ChelseaPlayers.csv'
+
+
+def test_output_format_rejects_unknown(monkeypatch):
+    monkeypatch.setenv("PARSE_OUTPUT_FORMAT", "xlsx")
+    with pytest.raises(ValueError):
+        columnar.output_format()
+
+
+def test_to_arrow_types_columns_from_schema():
+    table = columnar.to_arrow(PLAYERS.file_name, PLAYERS.col_names, PLAYER_ROWS)
+
+    assert table.column_names == ['player_id', 'player_name', 'player_position', 'player_dob', 'player_nationality']
+    assert table.schema.field('player_id').type == pa.int32()
+    assert table.schema.field('player_dob').type == pa.date32()
+    assert table.column('player_dob').to_pylist() == [datetime.date(2002, 5, 6), None]
+    assert table.column('player_position').to_pylist() == ['Midfield', None]
+
+
+def test_to_arrow_truncates_timestamps_and_uses_bigint_ids():
+    row = dict.fromkeys(MATCHES.col_names)
+    row.update({'MATCH_ID': 2 ** 40, 'MATCH_DATE': '2024-08-18T15:30:00Z'})
+
+    table = columnar.to_arrow(MATCHES.file_name, MATCHES.col_names, [row])
+
+    assert table.schema.field('match_id').type == pa.int64()
+    assert table.column('match_id').to_pylist() == [2 ** 40]
+    assert table.column('match_date').to_pylist() == [datetime.date(2024, 8, 18)]
+
+
+def test_to_arrow_rejects_column_mismatch():
+    with pytest.raises(ValueError):
+        columnar.to_arrow(PLAYERS.file_name, PLAYERS.col_names[:2], [])
+
+
+def test_parquet_round_trip(tmp_path):
+    columnar.write_parquet(file_name=PLAYERS.file_name, writePath=str(tmp_path),
+                           col_names=PLAYERS.col_names, row_data=iter(PLAYER_ROWS))
+
+    from_file = columnar.read_parquet(str(tmp_path / 'ChelseaPlayers.parquet'))
+    from_bytes = columnar.read_parquet(columnar.parquet_bytes(PLAYERS.file_name, PLAYERS.col_names, PLAYER_ROWS))
+
+    assert from_file.equals(from_bytes)
+    assert from_file.num_rows == 2
+
+
+def test_arrow_to_csv_quotes_text_and_leaves_nulls_empty():
+    table = columnar.to_arrow(PLAYERS.file_name, PLAYERS.col_names, PLAYER_ROWS)
+
+    lines = columnar.arrow_to_csv(table).read().splitlines()
+
+    assert lines == ['1,"Cole Palmer","Midfield",2002-05-06,"England"',
+                     '2,"Robert, Jr.",,,"Spain"']
@@ -2,10 +2,11 @@ import os
 import json
 import pytest
 from unittest.mock import patch, MagicMock
-from io import StringIO
 from moto import mock_aws
 
 import extract_data
+from aws_clients import reset_s3_client
+from helperFunction import StageError
 
 
 @pytest.fixture(autouse=True)
@@ -13,6 +14,9 @@ def set_env_vars(monkeypatch):
     """Automatically set AWS credentials for boto3 mock."""
     monkeypatch.setenv("AWS_ACCESS_KEY", "fake_access_key")
     monkeypatch.setenv("AWS_SECRET_KEY", "fake_secret_key")
+    reset_s3_client()
+    yield
+    reset_s3_client()
 
 
 @pytest.fixture
@@ -23,7 +27,8 @@ def mock_wrapped_request():
         "result": MagicMock(
             status_code=200,
             url="http://fakeapi.com/test",
-            text=json.dumps({"foo": "bar"})
+            text=json.dumps({"foo": "bar"}),
+            iter_content=lambda chunk_size: iter([json.dumps({"foo": "bar"}).encode("utf-8")])
         )
     }
     mock_response.get = MagicMock(return_value=mock_result["result"])
@@ -55,35 +60,6 @@ def test_ingest_data_raises_on_error(tmp_path):
             extract_data.ingest_data("url", "key", tmp_path, "api", "file.json")
 
 
-@mock_aws
-def test_upload_json_to_s3_uploads(monkeypatch):
-    """Test upload_json_to_s3 uploads to S3 using moto mock."""
-    import boto3
-
-    s3 = boto3.client("s3")
-    bucket_name = "test-bucket"
-    s3.create_bucket(Bucket=bucket_name)
-
-    json_data = {"hello": "world"}
-
-    extract_data.upload_json_to_s3(json_data, bucket_name, "data.json")
-
-    response = s3.get_object(Bucket=bucket_name, Key="data.json")
-    content = json.loads(response["Body"].read().decode("utf-8"))
-    assert content == json_data
-
-
-@mock_aws
-def test_upload_json_to_s3_raises_on_error(monkeypatch):
-    """Test upload_json_to_s3 raises on boto3 failure."""
-    json_data = {"test": "data"}
-
-    with patch("boto3.client") as mock_client:
-        mock_client.return_value.put_object.side_effect = Exception("S3 Error")
-        with pytest.raises(Exception, match="S3 Error"):
-            extract_data.upload_json_to_s3(json_data, "fake-bucket", "data.json")
-
-
 @mock_aws
 def test_ingest_data_to_s3_combined_flow(mock_wrapped_request):
     """Test full flow: API ingestion + S3 upload."""
@@ -105,3 +81,141 @@ def test_ingest_data_to_s3_combined_flow(mock_wrapped_request):
     response = s3.get_object(Bucket=bucket_name, Key="output.json")
     content = json.loads(response["Body"].read().decode("utf-8"))
     assert content == {"foo": "bar"}, "S3 object should contain API JSON data"
+
+
+def test_extract_endpoints_runs_every_endpoint():
+    """Test extract_endpoints calls ingest once per endpoint with the shared arguments."""
+    mock_ingest = MagicMock(return_value=None)
+    endpoints = [("api/a", "A.json"), ("api/b", "B.json")]
+
+    results = extract_data.extract_endpoints(mock_ingest, "http://fakeapi.com/", "key", "target", endpoints)
+
+    assert set(results) == {"A.json", "B.json"}
+    mock_ingest.assert_any_call("http://fakeapi.com/", "key", "target", "api/a", "A.json")
+    mock_ingest.assert_any_call("http://fakeapi.com/", "key", "target", "api/b", "B.json")
+
+
+def test_extract_endpoints_reports_failed_endpoints():
+    """Test extract_endpoints raises a StageError naming only the failed endpoint."""
+    def ingest(url, key, target, api_name, f_name):
+        if api_name == "api/bad":
+            raise Exception("API Error")
+
+    endpoints = [("api/good", "Good.json"), ("api/bad", "Bad.json")]
+    with pytest.raises(StageError) as excinfo:
+        extract_data.extract_endpoints(ingest, "url", "key", "target", endpoints)
+
+    assert list(excinfo.value.errors) == ["Bad.json"]
+
+
+def make_response(status_code, body=b"", headers=None):
+    """Build a fake requests response."""
+    return MagicMock(status_code=status_code, url="http://fakeapi.com/test",
+                     content=body, text=body.decode("utf-8"), headers=headers or {},
+                     iter_content=lambda chunk_size: iter([body[:3], body[3:]]))
+
+
+def test_ingest_data_sends_conditional_headers_and_skips_304(tmp_path):
+    """Test a 304 response leaves the existing file untouched and reports no change."""
+    (tmp_path / "data.json").write_text('{"old": true}')
+    validators = {"data.json": {"etag": '"abc"', "last_modified": "Sat, 18 Oct 2025 10:00:00 GMT", "sha256": "x"}}
+
+    with patch("extract_data.wrappedRequest", return_value={"result": make_response(304)}) as mock_request:
+        changed = extract_data.ingest_data("http://fakeapi.com/", "key", tmp_path, "endpoint", "data.json", validators)
+
+    assert changed is False
+    headers = mock_request.call_args.kwargs["headers"]
+    assert headers["If-None-Match"] == '"abc"'
+    assert headers["If-Modified-Since"] == "Sat, 18 Oct 2025 10:00:00 GMT"
+    assert (tmp_path / "data.json").read_text() == '{"old": true}'
+
+
+def test_ingest_data_detects_identical_payload_by_hash(tmp_path):
+    """Test a 200 with the same body as last run is reported unchanged."""
+    validators = {}
+    response = {"result": make_response(200, b'{"foo": "bar"}', {"ETag": '"v1"'})}
+
+    with patch("extract_data.wrappedRequest", return_value=response):
+        first = extract_data.ingest_data("http://fakeapi.com/", "key", tmp_path, "endpoint", "data.json", validators)
+        second = extract_data.ingest_data("http://fakeapi.com/", "key", tmp_path, "endpoint", "data.json", validators)
+
+    assert first is True
+    assert second is False
+    assert validators["data.json"]["etag"] == '"v1"'
+
+
+def test_validators_round_trip(tmp_path):
+    """Test validators saved to a directory load back unchanged."""
+    assert extract_data.load_validators(tmp_path) == {}
+    extract_data.save_validators({"a.json": {"sha256": "123"}}, tmp_path)
+    assert extract_data.load_validators(tmp_path) == {"a.json": {"sha256": "123"}}
+
+
+def test_ingest_data_streams_bytes_unchanged(tmp_path):
+    """Test the response bytes are written as received, without re-serialising."""
+    body = b'{"b": 1,\n  "a": [1, 2]}'
+    with patch("extract_data.wrappedRequest", return_value={"result": make_response(200, body)}) as mock_request:
+        extract_data.ingest_data("http://fakeapi.com/", "key", tmp_path, "endpoint", "data.json")
+
+    assert mock_request.call_args.kwargs["stream"] is True
+    assert (tmp_path / "data.json").read_bytes() == body
+    assert not (tmp_path / "data.json.part").exists()
+
+
+def test_ingest_data_rejects_non_json_body(tmp_path):
+    """Test a body that is not a JSON document fails without replacing the existing file."""
+    (tmp_path / "data.json").write_text('{"old": true}')
+    with patch("extract_data.wrappedRequest", return_value={"result": make_response(200, b"<html>oops</html>")}):
+        with pytest.raises(ValueError, match="not a JSON document"):
+            extract_data.ingest_data("http://fakeapi.com/", "key", tmp_path, "endpoint", "data.json")
+
+    assert (tmp_path / "data.json").read_text() == '{"old": true}'
+    assert not (tmp_path / "data.json.part").exists()
+
+
+def test_ingest_data_writes_compressed_file(tmp_path, monkeypatch):
+    """Test RAW_COMPRESSION=gzip stores the payload as a .gz file with the same content."""
+    import gzip
+    monkeypatch.setenv("RAW_COMPRESSION", "gzip")
+    body = b'{"foo": "bar"}'
+    with patch("extract_data.wrappedRequest", return_value={"result": make_response(200, body)}):
+        extract_data.ingest_data("http://fakeapi.com/", "key", tmp_path, "endpoint", "data.json")
+
+    assert not (tmp_path / "data.json").exists()
+    assert gzip.decompress((tmp_path / "data.json.gz").read_bytes()) == body
+
+
+@mock_aws
+def test_ingest_data_to_s3_refetches_missing_object():
+    """Test validators are dropped, and the request made unconditional, when the stored object is gone."""
+    import boto3
+
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="fake-bucket")
+    validators = {"json_files/data.json": {"etag": '"abc"', "sha256": "x"}}
+    response = {"result": make_response(200, b'{"foo": "bar"}', {"ETag": '"abc"'})}
+
+    with patch("extract_data.wrappedRequest", return_value=response) as mock_request:
+        changed = extract_data.ingest_data_to_s3("http://fakeapi.com/", "key", "fake-bucket", "endpoint",
+                                                 "json_files/data.json", validators)
+
+    assert changed is True
+    assert "If-None-Match" not in mock_request.call_args.kwargs["headers"]
+    assert s3.get_object(Bucket="fake-bucket", Key="json_files/data.json")["Body"].read() == b'{"foo": "bar"}'
+
+
+@mock_aws
+def test_ingest_data_to_s3_keeps_validators_for_existing_object():
+    import boto3
+
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="fake-bucket")
+    s3.put_object(Bucket="fake-bucket", Key="json_files/data.json.gz", Body=b"old")
+    validators = {"json_files/data.json": {"etag": '"abc"', "sha256": "x"}}
+
+    with patch("extract_data.wrappedRequest", return_value={"result": make_response(304)}) as mock_request:
+        changed = extract_data.ingest_data_to_s3("http://fakeapi.com/", "key", "fake-bucket", "endpoint",
+                                                 "json_files/data.json", validators)
+
+    assert changed is False
+    assert mock_request.call_args.kwargs["headers"]["If-None-Match"] == '"abc"'
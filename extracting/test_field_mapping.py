@@ -0,0 +1,52 @@
+from field_mapping import TableSpec, compile_path, parse_sources, MATCHES, STANDINGS
+
+
+def test_compile_path_reads_nested_keys_and_indexes():
+    doc = {"score": {"fullTime": {"home": 2}}, "referees": [{"name": "Ref A"}]}
+
+    assert compile_path("score.fullTime.home")(doc) == 2
+    assert compile_path("referees.0.name")(doc) == "Ref A"
+
+
+def test_compile_path_returns_none_for_missing_or_null_parts():
+    doc = {"score": None, "referees": [], "id": 0}
+
+    assert compile_path("score.fullTime.home")(doc) is None
+    assert compile_path("referees.0.name")(doc) is None
+    assert compile_path("missing")(doc) is None
+    assert compile_path("id")(doc) == 0
+
+
+def test_table_spec_extracts_rows_in_column_order():
+    spec = TableSpec("Out.csv", rows="items", columns=[("B", "b"), ("A", "a.x")])
+    rows = spec.extract({"items": [{"a": {"x": 1}, "b": 2}, {"b": 3}]})
+
+    assert spec.col_names == ["B", "A"]
+    assert rows == [(2, 1), (3, None)]
+    assert rows[0].B == 2 and rows[1].A is None
+
+
+def test_match_spec_takes_first_referee():
+    rows = MATCHES.extract({"matches": [{"id": 1, "referees": [{"name": "A"}, {"name": "B"}]}, {"id": 2}]})
+
+    assert [row.REFEREE_NAME for row in rows] == ["A", None]
+
+
+def test_standings_spec_without_standings_has_no_rows():
+    assert STANDINGS.extract({"standings": []}) == []
+    assert STANDINGS.file_name.format(league="Premier") == "PremierLeagueStandings.csv"
+
+
+def test_parse_sources_concatenates_rows_across_sources():
+    docs = {
+        "A.json": {"standings": [{"table": [{"position": 1, "team": {"id": 61}}]}]},
+        "B.json": {"standings": [{"table": [{"position": 2, "team": {"id": 57}}]}]},
+    }
+    read = docs.__getitem__
+
+    tables = parse_sources(read, ["A.json", "B.json"], [STANDINGS], ["PremierLeagueStandings.csv"])
+
+    [(file_name, (spec, rows))] = tables.items()
+    assert file_name == "PremierLeagueStandings.csv" and spec is STANDINGS
+    assert [(row.POSITION, row.TEAM_ID) for row in rows] == [(1, 61), (2, 57)]
+    assert parse_sources(read, [], [MATCHES]) == {"ChelseaMatches.csv": (MATCHES, [])}
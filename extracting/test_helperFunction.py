@@ -2,7 +2,16 @@ import os
 import csv
 import pytest
 from unittest.mock import patch, MagicMock
-from helperFunction import removeCSV, writeData2CSV, wrappedRequest
+from helperFunction import removeCSV, writeData2CSV, wrappedRequest, runConcurrently, StageError, getSession, closeSession, get
+from helperFunction import RateLimiter, resetRateLimiter
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limiter():
+    """Give every test its own process-wide rate limiter."""
+    resetRateLimiter()
+    yield
+    resetRateLimiter()
 
 
 def test_remove_csv_deletes_matching_files(tmp_path):
@@ -49,6 +58,20 @@ def test_write_data_to_csv_creates_file_with_correct_content(tmp_path):
     assert data == [{"name": "Alice", "age": "30"}, {"name": "Bob", "age": "25"}]
 
 
+def test_write_data_to_csv_tuple_rows_match_dict_rows(tmp_path):
+    """Test tuple rows in column order are written exactly like the equivalent dicts."""
+    cols = ["name", "note", "age"]
+    dict_rows = [{"name": "Alice", "note": "a, b", "age": 30}, {"name": "Bob", "note": None, "age": 25}]
+    tuple_rows = (tuple(row[c] for c in cols) for row in dict_rows)
+
+    writeData2CSV("dicts.csv", tmp_path, cols, dict_rows)
+    writeData2CSV("tuples.csv", tmp_path, cols, tuple_rows)
+    writeData2CSV("empty.csv", tmp_path, cols, [])
+
+    assert (tmp_path / "tuples.csv").read_bytes() == (tmp_path / "dicts.csv").read_bytes()
+    assert (tmp_path / "empty.csv").read_text() == "name,note,age\n"
+
+
 def test_write_data_to_csv_raises_on_error(monkeypatch, tmp_path):
     """Test writeData2CSV raises if file cannot be written."""
     monkeypatch.setattr("builtins.open", lambda *a, **k: (_ for _ in ()).throw(IOError("Disk full")))
@@ -91,3 +114,171 @@ def test_wrapped_request_raises_after_all_retries(mock_sleep, mock_get):
         wrappedRequest("http://fakeapi.com", {}, {}, retry=2)
     assert mock_get.call_count == 2
     assert mock_sleep.called
+
+
+def test_run_concurrently_returns_results_by_name():
+    """Test runConcurrently returns each task's result keyed by name."""
+    tasks = {"a": (lambda x: x * 2, (1,)), "b": (lambda x: x * 3, (2,))}
+
+    results = runConcurrently(tasks, max_workers=2)
+    assert results == {"a": 2, "b": 6}
+
+
+def test_run_concurrently_reports_every_failure():
+    """Test runConcurrently finishes all tasks and raises StageError listing failures."""
+    done = []
+
+    def fail(msg):
+        raise ValueError(msg)
+
+    tasks = {
+        "ok": (done.append, ("ran",)),
+        "bad1": (fail, ("first",)),
+        "bad2": (fail, ("second",)),
+    }
+    with pytest.raises(StageError) as excinfo:
+        runConcurrently(tasks, max_workers=3)
+
+    assert done == ["ran"]
+    assert set(excinfo.value.errors) == {"bad1", "bad2"}
+
+
+def test_run_concurrently_in_processes():
+    """Test runConcurrently can run picklable tasks in worker processes."""
+    tasks = {"pid": (os.getpid, ()), "pow": (pow, (2, 10)), "bad": (int, ("x",))}
+
+    with pytest.raises(StageError) as excinfo:
+        runConcurrently(tasks, max_workers=2, processes=True)
+
+    assert set(excinfo.value.errors) == {"bad"}
+    assert isinstance(excinfo.value.errors["bad"], ValueError)
+    assert runConcurrently({"pid": (os.getpid, ())}, processes=True)["pid"] != os.getpid()
+
+
+def test_get_session_is_shared_and_pooled():
+    """Test getSession reuses one session with the requested pool size."""
+    closeSession()
+    try:
+        session = getSession(pool_size=7)
+        assert getSession() is session
+        adapter = session.get_adapter("https://api.football-data.org/")
+        assert adapter._pool_maxsize == 7
+    finally:
+        closeSession()
+
+
+def test_get_uses_shared_session(monkeypatch):
+    """Test get sends requests through the shared session."""
+    mock_session = MagicMock()
+    monkeypatch.setattr("helperFunction.getSession", lambda: mock_session)
+
+    get("http://fakeapi.com", {"a": 1}, headers={"X-Auth-Token": "abc"})
+    mock_session.get.assert_called_once_with("http://fakeapi.com", params={"a": 1}, headers={"X-Auth-Token": "abc"})
+
+
+@patch("helperFunction.get")
+@patch("helperFunction.sleep")
+def test_wrapped_request_accepts_not_modified(mock_sleep, mock_get):
+    """Test wrappedRequest returns a 304 straight away instead of retrying."""
+    mock_get.return_value = MagicMock(status_code=304)
+
+    result = wrappedRequest("http://fakeapi.com", {}, {"If-None-Match": '"abc"'})
+    assert result["result"].status_code == 304
+    assert mock_get.call_count == 1
+    assert not mock_sleep.called
+
+
+class FakeClock:
+    """Stands in for monotonic/sleep so rate limiter waits are instant and recorded."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr("helperFunction.monotonic", fake.monotonic)
+    monkeypatch.setattr("helperFunction.sleep", fake.sleep)
+    return fake
+
+
+def test_rate_limiter_paces_requests_once_bucket_is_empty(clock):
+    """Test the bucket allows a burst of rate requests, then refills continuously."""
+    limiter = RateLimiter(rate=2, period=60)
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release()
+
+    assert clock.sleeps == [pytest.approx(30.0)]
+
+
+def test_rate_limiter_follows_quota_headers(clock):
+    """Test the API's remaining count and reset countdown override the local bucket."""
+    limiter = RateLimiter(rate=10, period=60)
+    limiter.acquire()
+    limiter.release({"X-Requests-Available-Minute": "0", "X-RequestCounter-Reset": "12"}, 200)
+
+    limiter.acquire()
+    assert clock.sleeps == [pytest.approx(12.0)]
+    assert limiter.tokens == 9
+
+
+def test_rate_limiter_honours_retry_after(clock):
+    """Test a 429 holds the next request for exactly Retry-After seconds."""
+    limiter = RateLimiter(rate=10, period=60)
+    limiter.acquire()
+    limiter.release({"Retry-After": "7"}, 429)
+
+    limiter.acquire()
+    assert clock.sleeps[0] == pytest.approx(7.0)
+
+
+def test_wrapped_request_waits_for_rate_limit_on_429(clock, monkeypatch):
+    """Test wrappedRequest retries a 429 after the Retry-After wait only."""
+    responses = iter([
+        MagicMock(status_code=429, headers={"Retry-After": "3"}),
+        MagicMock(status_code=200, headers={}),
+    ])
+    monkeypatch.setattr("helperFunction.get", lambda *a, **k: next(responses))
+
+    result = wrappedRequest("http://fakeapi.com", {}, {}, retry=3)
+    assert result["result"].status_code == 200
+    assert result["retry"] == 1
+    assert clock.sleeps == [pytest.approx(3.0)]
+
+
+def test_wrapped_request_honours_retry_after_on_any_5xx(clock, monkeypatch):
+    """Test a 502 with Retry-After waits for the server's hint instead of retrying at once."""
+    responses = iter([
+        MagicMock(status_code=502, headers={"Retry-After": "4"}),
+        MagicMock(status_code=200, headers={}),
+    ])
+    monkeypatch.setattr("helperFunction.get", lambda *a, **k: next(responses))
+
+    result = wrappedRequest("http://fakeapi.com", {}, {}, retry=3, limiter=RateLimiter(rate=10, period=60))
+    assert result["result"].status_code == 200
+    assert clock.sleeps == [pytest.approx(4.0)]
+
+
+def test_write_data_to_csv_keeps_last_good_file_when_rows_fail(tmp_path):
+    """Test a row stream that fails part-way leaves the previous file intact and no temp file."""
+    (tmp_path / "out.csv").write_text("col\nold\n")
+
+    def rows():
+        yield ("new",)
+        raise ValueError("bad JSON")
+
+    with pytest.raises(ValueError, match="bad JSON"):
+        writeData2CSV("out.csv", tmp_path, ["col"], rows())
+
+    assert (tmp_path / "out.csv").read_text() == "col\nold\n"
+    assert not (tmp_path / "out.csv.part").exists()
@@ -0,0 +1,57 @@
+import json
+import pytest
+
+import job_spec
+
+
+def test_default_spec_matches_the_chelsea_endpoints():
+    """The shipped jobs.json expands to the four endpoints the pipelines always fetched."""
+    endpoints = job_spec.expand_jobs(job_spec.load_job_spec())
+
+    assert sorted(endpoints) == sorted([
+        ('v4/teams/61/matches/', "ChelseaMatches.json"),
+        ('v4/teams/61', "ChelseaTeamDetails.json"),
+        ('v4/competitions/2021/standings', "PremierLeagueStandings.json"),
+        ('v4/competitions/2001/standings', "ChampionsLeagueStandings.json"),
+    ])
+
+
+def test_expand_jobs_dedupes_shared_standings():
+    """Two teams in the same competition share one standings call per season."""
+    spec = {
+        "seasons": [2023, None],
+        "teams": [
+            {"id": 61, "name": "Chelsea", "competitions": [2021]},
+            {"id": 57, "name": "Arsenal", "competitions": [2021, 2001]},
+        ],
+        "competitions": [{"id": 2021, "name": "PremierLeague"}],
+    }
+
+    endpoints = job_spec.expand_jobs(spec)
+    api_names = [api_name for api_name, _ in endpoints]
+
+    assert len(api_names) == len(set(api_names))
+    assert ('v4/competitions/2021/standings?season=2023', "PremierLeagueStandings_2023.json") in endpoints
+    assert ('v4/competitions/2001/standings', "Competition2001Standings.json") in endpoints
+    assert ('v4/teams/57/matches/?season=2023', "ArsenalMatches_2023.json") in endpoints
+    assert api_names.count('v4/competitions/2021/standings') == 1
+    # 2 teams x (2 match seasons + details) + 2 competitions x 2 seasons
+    assert len(endpoints) == 10
+
+
+def test_load_job_spec_uses_env_override(tmp_path, monkeypatch):
+    """JOB_SPEC points the pipelines at a different spec file."""
+    spec_file = tmp_path / "jobs.json"
+    spec_file.write_text(json.dumps({"teams": [{"id": 1, "name": "Test"}]}))
+    monkeypatch.setenv("JOB_SPEC", str(spec_file))
+
+    assert job_spec.load_job_spec() == {"teams": [{"id": 1, "name": "Test"}]}
+
+
+def test_require_files_names_the_files_no_endpoint_fetches():
+    """A seasons-only spec writes ChelseaMatches_2024.json, not the ChelseaMatches.json the parse stages read."""
+    endpoints = job_spec.expand_jobs({"seasons": [2024], "teams": [{"id": 61, "name": "Chelsea"}]})
+
+    job_spec.require_files(endpoints, ["ChelseaTeamDetails.json"])
+    with pytest.raises(ValueError, match="ChelseaMatches.json"):
+        job_spec.require_files(endpoints, ["ChelseaMatches.json", "ChelseaTeamDetails.json"])
@@ -0,0 +1,33 @@
+import io
+import json
+import pytest
+
+from json_stream import iter_array_items
+
+
+def test_iter_array_items_matches_json_loads_at_any_chunk_size():
+    """Items are identical to a full decode even when values straddle chunk boundaries."""
+    doc = {
+        "filters": {"season": "2024", "nested": [1, {"a": "]}"}]},
+        "matches": [{"id": 1, "score": {"home": 12345}}, -0.5, 333e1, 'tricky "]}" string', None, True],
+        "resultSet": {"count": 6},
+    }
+    text = json.dumps(doc)
+
+    for chunk_size in (1, 3, 16, 1024):
+        assert list(iter_array_items(io.StringIO(text), "matches", chunk_size=chunk_size)) == doc["matches"]
+
+
+@pytest.mark.parametrize("text", ['{}', '{"other": [1]}', '{"matches": []}', '{"matches": null}'])
+def test_iter_array_items_yields_nothing_without_items(text):
+    assert list(iter_array_items(io.StringIO(text), "matches")) == []
+
+
+def test_iter_array_items_is_lazy():
+    """Items are produced before the rest of the document is read."""
+    items = iter_array_items(io.StringIO('{"matches": [1, 2, broken'), "matches", chunk_size=4)
+
+    assert next(items) == 1
+    assert next(items) == 2
+    with pytest.raises(ValueError):
+        next(items)
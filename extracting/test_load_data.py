@@ -1,11 +1,11 @@
 import os
 import pytest
-import pandas as pd
 from io import StringIO
 from unittest.mock import patch, MagicMock
 from moto import mock_aws
 
 import load_data
+from aws_clients import reset_s3_client
 
 
 @pytest.fixture(autouse=True)
@@ -19,6 +19,9 @@ def mock_env(monkeypatch):
     monkeypatch.setenv("DB_PORT", "5432")
     monkeypatch.setenv("DB_PASSWORD", "password")
     monkeypatch.setenv("BUCKET_NAME", "fake-bucket")
+    reset_s3_client()
+    yield
+    reset_s3_client()
 
 
 @mock_aws
@@ -41,47 +44,6 @@ def test_connect_to_postgres_calls_psycopg2(mock_connect):
     assert kwargs["password"] == "password"
 
 
-@mock_aws
-def test_download_csv_from_s3_to_dataframe(monkeypatch):
-    """Test successful download of CSV from mock S3."""
-    import boto3
-    s3 = boto3.client("s3")
-    bucket_name = "fake-bucket"
-    s3.create_bucket(Bucket=bucket_name)
-
-    csv_data = "col1,col2\n1,2\n3,4\n"
-    s3.put_object(Bucket=bucket_name, Key="data.csv", Body=csv_data)
-
-    df = load_data.download_csv_from_s3_to_dataframe(bucket_name, "data.csv")
-    assert isinstance(df, pd.DataFrame)
-    assert list(df.columns) == ["col1", "col2"]
-    assert len(df) == 2
-
-
-@mock_aws
-def test_download_csv_from_s3_to_dataframe_raises(monkeypatch):
-    """Test exception handling when S3 get_object fails."""
-    monkeypatch.setattr("load_data.get_s3_client", lambda: MagicMock(
-        get_object=MagicMock(side_effect=Exception("S3 error"))
-    ))
-    with pytest.raises(Exception, match="S3 error"):
-        load_data.download_csv_from_s3_to_dataframe("bucket", "missing.csv")
-
-
-def test_insert_dataframe_to_postgres_executes_queries(monkeypatch):
-    """Test that insert_dataframe_to_postgres truncates and loads data."""
-    df = pd.DataFrame({"col1": [1, 2], "col2": ["a", "b"]})
-    mock_cursor = MagicMock()
-    mock_conn = MagicMock()
-    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-
-    load_data.insert_dataframe_to_postgres(df, "test_table", mock_conn)
-
-    mock_cursor.execute.assert_any_call("TRUNCATE TABLE test_table;")
-    assert mock_cursor.copy_from.called, "Should use COPY FROM to load data"
-
-
-
 @patch("load_data.connect_to_postgres")
 def test_insert_data_to_db_loads_all_csvs(mock_connect, tmp_path, monkeypatch):
     """Test that insert_data_to_db truncates and loads each table."""
@@ -104,7 +66,7 @@ def test_insert_data_to_db_loads_all_csvs(mock_connect, tmp_path, monkeypatch):
         (csv_dir / name).write_text("col1,col2\n1,2\n")
 
 
-    monkeypatch.setattr(load_data, "__file__", str(tmp_path / "load_data.py"))
+    monkeypatch.setattr(load_data, "__file__", str(tmp_path / "extracting" / "load_data.py"))
 
 
     import builtins
@@ -114,26 +76,46 @@ def test_insert_data_to_db_loads_all_csvs(mock_connect, tmp_path, monkeypatch):
         load_data.insert_data_to_db()
 
     assert mock_cursor.execute.call_count >= 6
-    assert mock_cursor.copy_from.call_count >= 6
+    assert mock_cursor.copy_expert.call_count >= 6
     mock_conn.commit.assert_called_once()
     mock_conn.close.assert_called_once()
 
 
+def truncated(mock_cursor):
+    return [c.args[0] for c in mock_cursor.execute.call_args_list if c.args[0].startswith("TRUNCATE")]
+
+
+def load_data_tables(extension):
+    return ["csv_files/" + name + extension for name in (
+        "ChampionsLeagueStandings", "PremierLeagueStandings", "ChelseaMatches",
+        "ChelseaPlayers", "CompetitionDetails", "ChelseaTeamDetails")]
+
 
 @patch("load_data.connect_to_postgres")
 def test_insert_data_to_db_from_s3_success(mock_connect):
-    """Test S3-to-Postgres data flow succeeds."""
+    """Test S3-to-Postgres data flow streams each object into COPY without pandas."""
+    import boto3
+
     mock_conn = MagicMock()
     mock_cursor = MagicMock()
     mock_connect.return_value = mock_conn
     mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-
-    fake_df = pd.DataFrame({"col1": [1, 2]})
-    with patch("load_data.download_csv_from_s3_to_dataframe", return_value=fake_df), \
-         patch("load_data.insert_dataframe_to_postgres") as mock_insert:
+    copied = []
+    mock_cursor.copy_expert.side_effect = lambda sql, f, size: copied.append((sql, size, f.read()))
+
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="fake-bucket")
+        for key in load_data_tables(".csv"):
+            s3.put_object(Bucket="fake-bucket", Key=key, Body="col1,col2\n1,\"a, b\"\n")
         load_data.insert_data_to_db_from_s3()
 
-    mock_insert.assert_called()
+    assert len(copied) == 6
+    sql, size, body = copied[2]
+    assert sql.startswith("COPY chelsea_matches (area_name, ")
+    assert sql.endswith("FROM STDIN WITH (FORMAT csv, HEADER true)")
+    assert size == load_data.COPY_CHUNK_SIZE
+    assert body == b'col1,col2\n1,"a, b"\n'
     mock_conn.commit.assert_called_once()
     mock_conn.close.assert_called_once()
 
@@ -146,9 +128,455 @@ def test_insert_data_to_db_from_s3_rollback_on_error(mock_connect):
     mock_connect.return_value = mock_conn
     mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
 
-    with patch("load_data.download_csv_from_s3_to_dataframe", side_effect=Exception("Bad S3")):
+    with patch("load_data.get_s3_client", return_value=MagicMock(
+            get_object=MagicMock(side_effect=Exception("Bad S3")))):
         with pytest.raises(Exception, match="Bad S3"):
             load_data.insert_data_to_db_from_s3()
 
     mock_conn.rollback.assert_called_once()
     mock_conn.close.assert_called_once()
+
+
+def test_load_data_does_not_import_pandas():
+    """The loader and cloud parser never import pandas."""
+    import subprocess
+    import sys
+
+    code = "import sys, load_data, parse_data_cloud, pipeline; print('pandas' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    assert result.stdout.strip() == "False"
+
+
+@mock_aws
+def test_download_parquet_from_s3():
+    """A Parquet object is read back as a typed pyarrow Table."""
+    pytest.importorskip("pyarrow")
+    import boto3
+    from columnar import parquet_bytes
+    from field_mapping import PLAYERS
+
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="fake-bucket")
+    s3.put_object(Bucket="fake-bucket", Key="csv_files/ChelseaPlayers.parquet",
+                  Body=parquet_bytes(PLAYERS.file_name, PLAYERS.col_names, [{"PLAYER_ID": 10}]))
+
+    table = load_data.download_parquet_from_s3("fake-bucket", "csv_files/ChelseaPlayers.parquet")
+
+    assert table.column("player_id").to_pylist() == [10]
+
+
+@patch("load_data.connect_to_postgres")
+def test_insert_data_to_db_from_s3_parquet(mock_connect, monkeypatch):
+    """With PARSE_OUTPUT_FORMAT=parquet the loader COPYs Parquet tables without pandas."""
+    pytest.importorskip("pyarrow")
+    from columnar import to_arrow
+    from field_mapping import PLAYERS
+
+    monkeypatch.setenv("PARSE_OUTPUT_FORMAT", "parquet")
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_connect.return_value = mock_conn
+    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+    players = to_arrow(PLAYERS.file_name, PLAYERS.col_names,
+                       [{"PLAYER_ID": 10, "PLAYER_NAME": "Player, A", "PLAYER_DOB": "2000-01-31"}])
+
+    with patch("load_data.download_parquet_from_s3", return_value=players) as mock_download:
+        load_data.insert_data_to_db_from_s3()
+
+    assert ("fake-bucket", "csv_files/ChelseaPlayers.parquet") in [c.args for c in mock_download.call_args_list]
+    assert mock_cursor.copy_expert.call_count == 6
+    sql, buffer = mock_cursor.copy_expert.call_args_list[3].args
+    assert sql.startswith("COPY chelsea_players (player_id, player_name")
+    assert sql.endswith("FROM STDIN WITH (FORMAT csv)")
+    assert buffer.read() == '10,"Player, A",,2000-01-31,\n'
+    mock_conn.commit.assert_called_once()
+
+
+def test_copy_arrow_table_binary_encodes_typed_columns(monkeypatch):
+    """With COPY_FORMAT=binary a Parquet table's typed columns are encoded directly, not via CSV text."""
+    pytest.importorskip("pyarrow")
+    from binary_copy import encode_rows
+    from columnar import to_arrow
+    from field_mapping import PLAYERS
+
+    monkeypatch.setenv("COPY_FORMAT", "binary")
+    mock_cursor = MagicMock()
+    copied = copied_data(mock_cursor)
+    players = to_arrow(PLAYERS.file_name, PLAYERS.col_names,
+                       [{"PLAYER_ID": 10, "PLAYER_NAME": "Player, A", "PLAYER_DOB": "2000-01-31"}])
+
+    load_data.copy_arrow_table(mock_cursor, players, "chelsea_players", "chelsea_players__staging")
+
+    [(sql, data)] = copied
+    assert sql.endswith("FROM STDIN WITH (FORMAT binary)")
+    assert data == b''.join(encode_rows("chelsea_players", [[10, "Player, A", None, "2000-01-31", None]]))
+
+
+@patch("load_data.connect_to_postgres")
+def test_insert_tables_to_db_copies_rows_from_memory(mock_connect):
+    """Parsed rows are COPYed straight from memory, only into the tables given."""
+    from field_mapping import PLAYERS
+
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_connect.return_value = mock_conn
+    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+    rows = [{"PLAYER_ID": 10, "PLAYER_NAME": "Player, A", "PLAYER_DOB": "2000-01-31"}]
+
+    load_data.insert_tables_to_db({"csv_files/ChelseaPlayers.csv": (PLAYERS, rows)})
+
+    assert truncated(mock_cursor) == ["TRUNCATE TABLE chelsea_players;"]
+    sql, buffer = mock_cursor.copy_expert.call_args.args
+    assert sql == ("COPY chelsea_players (player_id, player_name, player_position, player_dob, "
+                   "player_nationality) FROM STDIN WITH (FORMAT csv)")
+    assert buffer.read() == '10,"Player, A",,2000-01-31,\r\n'
+    mock_conn.commit.assert_called_once()
+    mock_conn.close.assert_called_once()
+
+
+@patch("load_data.connect_to_postgres")
+def test_insert_tables_to_db_rolls_back_on_error(mock_connect):
+    mock_conn = MagicMock()
+    mock_connect.return_value = mock_conn
+    mock_conn.cursor.return_value.__enter__.return_value.copy_expert.side_effect = Exception("COPY failed")
+    from field_mapping import PLAYERS
+
+    with pytest.raises(Exception, match="COPY failed"):
+        load_data.insert_tables_to_db({"csv_files/ChelseaPlayers.csv": (PLAYERS, [])})
+
+    mock_conn.rollback.assert_called_once()
+    mock_conn.close.assert_called_once()
+
+
+@patch("load_data.connect_to_postgres")
+def test_insert_data_to_db_only_loads_given_tables(mock_connect, tmp_path, monkeypatch):
+    """Only the tables named in tables are truncated and reloaded."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_connect.return_value = mock_conn
+    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+    csv_dir = tmp_path / "csv_files"
+    csv_dir.mkdir()
+    (csv_dir / "ChelseaMatches.csv").write_text("col1,col2\n1,2\n")
+    monkeypatch.setattr(load_data, "__file__", str(tmp_path / "extracting" / "load_data.py"))
+
+    load_data.insert_data_to_db(tables=["ChelseaMatches.csv"])
+
+    assert truncated(mock_cursor) == ["TRUNCATE TABLE chelsea_matches;"]
+    assert mock_cursor.copy_expert.call_count == 1
+    mock_conn.commit.assert_called_once()
+
+
+TEAM_DETAILS_CSV = ("AREA_ID,AREA_NAME,AREA_CODE,AREA_FLAG,TEAM_ID,TEAM_NAME,TEAM_SHORTNAME,TEAM_TLA,TEAM_CREST,"
+                    "ADDRESS,WEBSITE,FOUNDED,CLUB_COLORS,VENUE,COACH_ID,COACH_FIRSTNAME,COACH_LASTNAME,COACH_NAME,"
+                    "COACH_DOB,COACH_NATIONALITY,COACH_CONTRACT_START,COACH_CONTRACT_UNTIL\n"
+                    "2072,England,ENG,eng.svg,61,Chelsea FC,Chelsea,CHE,61.png,\"Fulham Road, London SW6 1HS\","
+                    "http://www.chelseafc.com,1905,Royal Blue / White,Stamford Bridge,8262,Liam,Rosenior,"
+                    "Liam Rosenior,1984-07-09,England,2026-01,2032-06\n")
+
+
+def copied_data(mock_cursor):
+    copied = []
+    mock_cursor.copy_expert.side_effect = lambda sql, f, size=8192: copied.append((sql, f.read()))
+    return copied
+
+
+@pytest.mark.parametrize("copy_format", ["csv", "binary"])
+@patch("load_data.connect_to_postgres")
+def test_insert_data_to_db_keeps_commas_inside_quoted_fields(mock_connect, copy_format, tmp_path, monkeypatch):
+    """Local CSVs are COPYed as CSV whatever COPY_FORMAT says, not split on every comma."""
+    mock_cursor = MagicMock()
+    mock_connect.return_value.cursor.return_value.__enter__.return_value = mock_cursor
+    copied = copied_data(mock_cursor)
+    csv_dir = tmp_path / "csv_files"
+    csv_dir.mkdir()
+    (csv_dir / "ChelseaTeamDetails.csv").write_text(TEAM_DETAILS_CSV)
+    monkeypatch.setattr(load_data, "__file__", str(tmp_path / "extracting" / "load_data.py"))
+    monkeypatch.setenv("COPY_FORMAT", copy_format)
+
+    load_data.insert_data_to_db(tables=["ChelseaTeamDetails.csv"])
+
+    [(sql, data)] = copied
+    assert sql.startswith("COPY chelsea_team_details (area_id, ")
+    assert sql.endswith("FROM STDIN WITH (FORMAT csv, HEADER true)")
+    assert data == TEAM_DETAILS_CSV
+
+
+@patch("load_data.connect_to_postgres")
+def test_insert_tables_to_db_binary_copy_into_staging(mock_connect, monkeypatch):
+    """COPY_FORMAT=binary encodes rows from the live table's types, COPYing into the merge staging table."""
+    from binary_copy import encode_rows
+    from field_mapping import PLAYERS
+
+    mock_cursor = MagicMock()
+    mock_cursor.fetchone.return_value = {"inserted": 1, "updated": 0}
+    mock_cursor.rowcount = 0
+    mock_connect.return_value.cursor.return_value.__enter__.return_value = mock_cursor
+    copied = copied_data(mock_cursor)
+    monkeypatch.setenv("COPY_FORMAT", "binary")
+    monkeypatch.setenv("LOAD_MODE", "merge")
+    rows = [{"PLAYER_ID": 10, "PLAYER_NAME": "Player, A", "PLAYER_DOB": "2000-01-31"}]
+
+    load_data.insert_tables_to_db({"csv_files/ChelseaPlayers.csv": (PLAYERS, rows)})
+
+    [(sql, data)] = copied
+    assert sql == ("COPY chelsea_players__staging (player_id, player_name, player_position, player_dob, "
+                   "player_nationality) FROM STDIN WITH (FORMAT binary)")
+    assert data == b''.join(encode_rows("chelsea_players", [[10, "Player, A", None, "2000-01-31", None]]))
+
+
+def test_copy_format_rejects_unknown(monkeypatch):
+    monkeypatch.setenv("COPY_FORMAT", "text")
+    with pytest.raises(ValueError):
+        load_data.copy_format()
+
+
+def test_merge_sql_upserts_changed_rows_and_deletes_missing_ones():
+    upsert, delete = load_data.merge_sql("premier_league_standings", "premier_league_standings__staging")
+
+    assert "ON CONFLICT (position, team_id) DO UPDATE SET team_name = EXCLUDED.team_name" in upsert
+    assert "position = EXCLUDED.position" not in upsert
+    assert "WHERE (premier_league_standings.team_name, " in upsert
+    assert "IS DISTINCT FROM (EXCLUDED.team_name, " in upsert
+    assert "RETURNING (xmax = 0) AS inserted" in upsert
+    assert delete == ("DELETE FROM premier_league_standings WHERE NOT EXISTS (SELECT 1 FROM "
+                      "premier_league_standings__staging WHERE "
+                      "premier_league_standings__staging.position = premier_league_standings.position AND "
+                      "premier_league_standings__staging.team_id = premier_league_standings.team_id);")
+
+
+def test_load_table_merge_mode_stages_and_reports_counts(monkeypatch):
+    """LOAD_MODE=merge COPYs into a staging table and merges it instead of truncating."""
+    monkeypatch.setenv("LOAD_MODE", "merge")
+    mock_cursor = MagicMock()
+    mock_cursor.fetchone.return_value = {"inserted": 2, "updated": 1}
+    mock_cursor.rowcount = 3
+    copy = MagicMock()
+
+    counts = load_data.load_table(mock_cursor, "chelsea_players", copy)
+
+    assert counts == {"inserted": 2, "updated": 1, "deleted": 3}
+    copy.assert_called_once_with(mock_cursor, "chelsea_players__staging")
+    statements = [c.args[0] for c in mock_cursor.execute.call_args_list]
+    assert statements[0] == "CREATE TEMP TABLE chelsea_players__staging (LIKE chelsea_players) ON COMMIT DROP;"
+    assert statements[1] == "LOCK TABLE chelsea_players IN ROW EXCLUSIVE MODE;"
+    assert statements[2] == load_data.merge_sql("chelsea_players", "chelsea_players__staging")[0]
+    assert statements[3].startswith("DELETE FROM chelsea_players")
+    assert not any("TRUNCATE" in sql for sql in statements)
+
+
+def test_load_mode_rejects_unknown(monkeypatch):
+    monkeypatch.setenv("LOAD_MODE", "append")
+    with pytest.raises(ValueError):
+        load_data.load_mode()
+
+
+def fake_connections(count):
+    """Return count mocked connections, each with its own cursor."""
+    conns = []
+    for _ in range(count):
+        conn = MagicMock()
+        conn.cursor.return_value.__enter__.return_value = MagicMock()
+        conns.append(conn)
+    return conns
+
+
+def executed(conn):
+    return [c.args[0] for c in conn.cursor.return_value.__enter__.return_value.execute.call_args_list]
+
+
+@patch("load_data.connect_to_postgres")
+def test_load_tables_parallel_stages_then_publishes_together(mock_connect):
+    """Tables are built as __next tables on a pool of connections and renamed in in one transaction."""
+    conns = fake_connections(2)
+    mock_connect.side_effect = conns
+    conns[0].cursor.return_value.__enter__.return_value.fetchall.return_value = []
+    copies = {table: MagicMock() for table in ("chelsea_matches", "chelsea_players", "chelsea_team_details")}
+
+    load_data.load_tables_parallel(copies, max_workers=2)
+
+    assert mock_connect.call_count == 2
+    for table, copy in copies.items():
+        assert copy.call_args.args[1] == f"{table}__next"
+    statements = executed(conns[0]) + executed(conns[1])
+    assert statements.count("CREATE TABLE chelsea_matches__next (LIKE chelsea_matches INCLUDING DEFAULTS);") == 1
+    assert not any(sql.startswith(("TRUNCATE", "INSERT", "CREATE UNLOGGED")) for sql in statements)
+    renames = [sql for sql in executed(conns[0]) if sql.startswith("ALTER TABLE") and "RENAME TO" in sql]
+    assert renames[:2] == ["ALTER TABLE chelsea_matches RENAME TO chelsea_matches__old;",
+                           "ALTER TABLE chelsea_matches__next RENAME TO chelsea_matches;"]
+    assert len(renames) == 6
+    assert executed(conns[0])[-1] == "DROP TABLE IF EXISTS chelsea_team_details__next;"
+    for conn in conns:
+        conn.close.assert_called_once()
+
+
+@patch("load_data.connect_to_postgres")
+def test_load_tables_parallel_merge_mode_merges_from_load_tables(mock_connect, monkeypatch):
+    """In merge mode tables are COPYed into unlogged __load tables and merged in one transaction."""
+    monkeypatch.setenv("LOAD_MODE", "merge")
+    conns = fake_connections(2)
+    mock_connect.side_effect = conns
+    conns[0].cursor.return_value.__enter__.return_value.fetchone.return_value = {"inserted": 1, "updated": 0}
+    copies = {table: MagicMock() for table in ("chelsea_matches", "chelsea_players")}
+
+    counts = load_data.load_tables_parallel(copies, max_workers=2)
+
+    for table, copy in copies.items():
+        assert copy.call_args.args[1] == f"{table}__load"
+    statements = executed(conns[0]) + executed(conns[1])
+    assert statements.count("CREATE UNLOGGED TABLE chelsea_matches__load (LIKE chelsea_matches);") == 1
+    assert "LOCK TABLE chelsea_players IN ROW EXCLUSIVE MODE;" in executed(conns[0])
+    assert counts["chelsea_players"]["inserted"] == 1
+
+
+@patch("load_data.connect_to_postgres")
+def test_load_tables_parallel_leaves_live_tables_alone_on_failure(mock_connect):
+    """If any table fails to COPY, no live table is touched and the __next tables are dropped."""
+    from helperFunction import StageError
+
+    conns = fake_connections(2)
+    mock_connect.side_effect = conns
+    copies = {"chelsea_matches": MagicMock(), "chelsea_players": MagicMock(side_effect=Exception("bad row"))}
+
+    with pytest.raises(StageError, match="bad row"):
+        load_data.load_tables_parallel(copies, max_workers=2)
+
+    statements = executed(conns[0]) + executed(conns[1])
+    assert not any(sql.startswith(("LOCK", "TRUNCATE", "INSERT")) or "__old" in sql for sql in statements)
+    assert "DROP TABLE IF EXISTS chelsea_players__next;" in executed(conns[0])
+    conns[0].rollback.assert_called()
+
+
+@patch("load_data.connect_to_postgres")
+def test_load_tables_parallel_closes_connections_if_one_fails_to_open(mock_connect):
+    conns = fake_connections(1)
+    mock_connect.side_effect = [conns[0], load_data.psycopg2.OperationalError("too many connections")]
+    copies = {table: MagicMock() for table in ("chelsea_matches", "chelsea_players")}
+
+    with pytest.raises(load_data.psycopg2.OperationalError):
+        load_data.load_tables_parallel(copies, max_workers=2)
+
+    for copy in copies.values():
+        copy.assert_not_called()
+    conns[0].close.assert_called_once()
+
+
+@patch("load_data.load_tables_parallel")
+@patch("load_data.connect_to_postgres")
+def test_insert_data_to_db_uses_parallel_loader_with_load_workers(mock_connect, mock_parallel, tmp_path, monkeypatch):
+    monkeypatch.setenv("LOAD_WORKERS", "3")
+    monkeypatch.setattr(load_data, "__file__", str(tmp_path / "extracting" / "load_data.py"))
+
+    load_data.insert_data_to_db(tables=["ChelseaMatches.csv", "ChelseaPlayers.csv"])
+
+    copies, workers = mock_parallel.call_args.args
+    assert sorted(copies) == ["chelsea_matches", "chelsea_players"]
+    assert workers == 3
+    mock_connect.assert_not_called()
+
+
+def test_swap_table_renames_next_table_in_and_recreates_views():
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [{"name": "stg_matches", "kind": "v",
+                                     "definition": " SELECT match_id FROM chelsea_matches;"}]
+
+    load_data.swap_table(cursor, "chelsea_matches", "chelsea_matches__next")
+
+    statements = [c.args[0] for c in cursor.execute.call_args_list]
+    assert cursor.execute.call_args_list[0].args == ("SET LOCAL lock_timeout = %s;", ("5s",))
+    assert statements[1] == "LOCK TABLE chelsea_matches IN ACCESS EXCLUSIVE MODE;"
+    assert statements[2].startswith("SELECT DISTINCT view.oid::regclass::text")
+    assert cursor.execute.call_args_list[2].args[1] == ("chelsea_matches",)
+    assert statements[3:] == [
+        "ALTER TABLE chelsea_matches RENAME TO chelsea_matches__old;",
+        "ALTER TABLE chelsea_matches__next RENAME TO chelsea_matches;",
+        "CREATE OR REPLACE VIEW stg_matches AS  SELECT match_id FROM chelsea_matches;",
+        "DROP TABLE chelsea_matches__old;",
+        "ALTER TABLE chelsea_matches RENAME CONSTRAINT chelsea_matches__next_pkey TO chelsea_matches_pkey;",
+    ]
+
+
+def test_swap_table_rebuilds_materialized_views_with_their_indexes(monkeypatch):
+    monkeypatch.setenv("SWAP_LOCK_TIMEOUT", "1s'; DROP TABLE chelsea_matches; --")
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = [
+        [{"name": "match_counts", "kind": "m", "definition": " SELECT count(*) AS n FROM chelsea_matches;"}],
+        [{"definition": "CREATE UNIQUE INDEX match_counts_n ON public.match_counts USING btree (n)"}],
+    ]
+
+    load_data.swap_table(cursor, "chelsea_matches", "chelsea_matches__next")
+
+    statements = [c.args[0] for c in cursor.execute.call_args_list]
+    assert cursor.execute.call_args_list[0].args[1] == ("1s'; DROP TABLE chelsea_matches; --",)
+    assert cursor.execute.call_args_list[3].args[1] == ("match_counts",)
+    assert statements[6:9] == [
+        "DROP MATERIALIZED VIEW match_counts;",
+        "CREATE MATERIALIZED VIEW match_counts AS  SELECT count(*) AS n FROM chelsea_matches;",
+        "CREATE UNIQUE INDEX match_counts_n ON public.match_counts USING btree (n);",
+    ]
+    assert statements[9] == "DROP TABLE chelsea_matches__old;"
+
+
+@patch("load_data.connect_to_postgres")
+def test_load_tables_swap_mode_builds_every_table_before_swapping(mock_connect, monkeypatch):
+    """In swap mode all __next tables are built and indexed first, then swapped together in one commit."""
+    monkeypatch.setenv("LOAD_MODE", "swap")
+    conns = fake_connections(1)
+    mock_connect.side_effect = conns
+    conns[0].cursor.return_value.__enter__.return_value.fetchall.return_value = []
+    copies = {table: MagicMock() for table in ("chelsea_players", "premier_league_standings")}
+
+    load_data.load_tables(copies)
+
+    for table, copy in copies.items():
+        assert copy.call_args.args[1] == f"{table}__next"
+    statements = executed(conns[0])
+    assert "CREATE TABLE chelsea_players__next (LIKE chelsea_players INCLUDING DEFAULTS);" in statements
+    assert ("ALTER TABLE premier_league_standings__next ADD CONSTRAINT premier_league_standings__next_pkey "
+            "PRIMARY KEY (position, team_id);") in statements
+    assert not any(sql.startswith(("TRUNCATE", "CREATE UNLOGGED")) for sql in statements)
+    last_build = statements.index("ANALYZE premier_league_standings__next;")
+    first_lock = statements.index("LOCK TABLE chelsea_players IN ACCESS EXCLUSIVE MODE;")
+    assert last_build < first_lock
+    assert statements[-1] == "DROP TABLE IF EXISTS premier_league_standings__next;"
+    conns[0].close.assert_called_once()
+
+
+@patch("load_data.connect_to_postgres")
+def test_load_tables_records_metrics_in_the_ledger(mock_connect, capsys):
+    """Each load appends its per-table rows, bytes and timings to pipeline_runs and prints them as JSON."""
+    import json
+
+    mock_cursor = MagicMock()
+    mock_cursor.rowcount = 2
+    mock_connect.return_value.cursor.return_value.__enter__.return_value = mock_cursor
+    copied_data(mock_cursor)
+
+    load_data.load_tables({"chelsea_players": lambda cursor, target: cursor.copy_expert("COPY", StringIO("1\n2\n"))})
+
+    sql, rows = mock_cursor.executemany.call_args.args
+    assert sql.startswith("INSERT INTO pipeline_runs ")
+    [row] = rows
+    assert row[1:7] == ("chelsea_players", "replace", "csv", 1, 2, 4)
+    assert row[9] >= 0
+    [line] = [line for line in capsys.readouterr().out.splitlines() if line.startswith("{")]
+    assert json.loads(line)["tables"][0]["rows"] == 2
+    mock_connect.return_value.commit.assert_called_once()
+
+
+@patch("load_data.connect_to_postgres")
+def test_load_tables_survives_a_missing_ledger(mock_connect):
+    """A ledger that cannot be written is rolled back to its savepoint; the load still commits."""
+    import psycopg2
+
+    mock_cursor = MagicMock()
+    mock_cursor.executemany.side_effect = psycopg2.ProgrammingError('relation "pipeline_runs" does not exist')
+    mock_connect.return_value.cursor.return_value.__enter__.return_value = mock_cursor
+
+    load_data.load_tables({"chelsea_players": MagicMock()})
+
+    statements = [c.args[0] for c in mock_cursor.execute.call_args_list]
+    assert statements[-2:] == ["SAVEPOINT ledger;", "ROLLBACK TO SAVEPOINT ledger;"]
+    mock_connect.return_value.commit.assert_called_once()
+    mock_connect.return_value.rollback.assert_not_called()
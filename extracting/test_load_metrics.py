@@ -0,0 +1,61 @@
+import json
+from io import BytesIO, StringIO
+from unittest.mock import MagicMock
+
+import load_metrics
+
+
+def test_copy_meter_counts_rows_bytes_and_time():
+    cursor = MagicMock()
+    cursor.rowcount = 2
+    cursor.copy_expert.side_effect = lambda sql, f, size: [f.read(4) for _ in range(3)]
+    metrics = load_metrics.TableMetrics("chelsea_players")
+
+    meter = load_metrics.metered(cursor, metrics)
+    meter.copy_expert("COPY chelsea_players FROM STDIN", StringIO("1,é\n2,b\n"), size=4)
+    meter.copy_expert("COPY chelsea_players FROM STDIN", BytesIO(b"PGCOPY"))
+
+    assert metrics.rows == 4
+    assert metrics.bytes == len("1,é\n2,b\n".encode("utf-8")) + len(b"PGCOPY")
+    assert metrics.copy_seconds > 0
+    assert cursor.copy_expert.call_args_list[0].kwargs == {"size": 4}
+    assert meter.rowcount == 2
+
+
+def test_copy_meter_ignores_unknown_rowcount():
+    cursor = MagicMock()
+    cursor.rowcount = -1
+    metrics = load_metrics.TableMetrics("chelsea_players")
+
+    load_metrics.metered(cursor, metrics).copy_expert("COPY chelsea_players FROM STDIN", StringIO(""))
+
+    assert metrics.rows == 0
+
+
+def test_metered_without_metrics_is_the_cursor():
+    cursor = MagicMock()
+    assert load_metrics.metered(cursor, None) is cursor
+
+
+def test_rows_per_second_needs_a_copy():
+    metrics = load_metrics.TableMetrics("chelsea_players")
+    assert metrics.rows_per_second is None
+
+    metrics.rows, metrics.copy_seconds = 500, 0.25
+    assert metrics.as_dict()["rows_per_second"] == 2000.0
+
+
+def test_run_summary_and_ledger_rows(capsys):
+    metrics = load_metrics.TableMetrics("chelsea_players")
+    metrics.rows, metrics.bytes, metrics.copy_seconds, metrics.lock_wait_seconds = 10, 400, 0.5, 0.01
+    settings = {"load_mode": "swap", "copy_format": "csv", "load_workers": 2}
+
+    summary = load_metrics.run_summary("run-1", settings, {"chelsea_players": metrics})
+    cursor = MagicMock()
+    load_metrics.record_run(cursor, summary)
+    load_metrics.emit_run(summary)
+
+    sql, rows = cursor.executemany.call_args.args
+    assert sql.startswith("INSERT INTO pipeline_runs (run_id, table_name, load_mode, ")
+    assert rows == [("run-1", "chelsea_players", "swap", "csv", 2, 10, 400, 0.5, 20.0, 0.01)]
+    assert json.loads(capsys.readouterr().out) == {"event": "load_metrics", "tables": summary}
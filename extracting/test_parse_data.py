@@ -1,3 +1,4 @@
+import csv
 import json
 import os
 import builtins
@@ -56,7 +57,7 @@ def test_parse_matches_calls_writeData2CSV(fake_paths):
     assert kwargs["file_name"] == "ChelseaMatches.csv"
     assert kwargs["writePath"] == csv_path
     assert len(kwargs["row_data"]) == 1
-    assert kwargs["row_data"][0]["HOME_TEAM_NAME"] == "Chelsea"
+    assert kwargs["row_data"][0].HOME_TEAM_NAME == "Chelsea"
 
 
 def test_parse_team_details_calls_writeData2CSV(fake_paths):
@@ -123,10 +124,33 @@ def test_parse_league_details(fake_paths):
     args, kwargs = mock_write.call_args
     assert kwargs["file_name"] == "CompetitionDetails.csv"
     assert len(kwargs["row_data"]) == 1
-    assert kwargs["row_data"][0]["COMPETITION_NAME"] == "Premier League"
+    assert kwargs["row_data"][0].COMPETITION_NAME == "Premier League"
 
 
 
+def test_parse_league_details_keeps_finished_seasons(fake_paths):
+    """Once a season ends the API sends its winner as an object; the row is still written, as text."""
+    json_path, csv_path = fake_paths
+    winner = {"id": 64, "name": "Liverpool FC", "shortName": "Liverpool", "tla": "LIV"}
+    competition_data = {
+        "area": {"id": 1, "name": "England", "code": "ENG", "flag": "flag"},
+        "competition": {"id": 39, "name": "Premier League", "code": "PL", "type": "LEAGUE", "emblem": "emblem"},
+        "season": {"id": 5, "startDate": "2024-08-16", "endDate": "2025-05-25", "currentMatchday": 38,
+                   "winner": winner},
+        "standings": [{"stage": "REGULAR_SEASON", "type": "TOTAL", "group": None}],
+    }
+    with open(os.path.join(json_path, "PremierLeagueStandings.json"), "w") as f:
+        json.dump(competition_data, f)
+
+    parse_data.parse_league_details(json_path, csv_path)
+
+    with open(os.path.join(csv_path, "CompetitionDetails.csv"), newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 1
+    assert rows[0]["SEASON_WiNNER"] == str(winner)
+    assert not os.path.exists(os.path.join(csv_path, "quarantine", "CompetitionDetails.quarantine.csv"))
+
+
 def test_parse_comp_standings(fake_paths):
     '''Checks that competition standings (like Champions League) generate the correct CSV file.'''
     json_path, csv_path = fake_paths
@@ -163,4 +187,99 @@ def test_parse_comp_standings(fake_paths):
     args, kwargs = mock_write.call_args
     assert kwargs["file_name"] == f"{league}LeagueStandings.csv"
     assert len(kwargs["row_data"]) == 1
-    assert kwargs["row_data"][0]["TEAM_NAME"] == "Chelsea"
+    assert kwargs["row_data"][0].TEAM_NAME == "Chelsea"
+
+
+def test_parse_comp_standings_reads_compressed_json(fake_paths):
+    '''Checks that a gzip-compressed raw file is decoded transparently.'''
+    import gzip
+    json_path, csv_path = fake_paths
+    data = {"competition": {"id": 2021},
+            "standings": [{"table": [{"position": 1, "team": {"id": 1, "name": "Chelsea"}}]}]}
+    with open(os.path.join(json_path, "PremierLeagueStandings.json.gz"), "wb") as f:
+        f.write(gzip.compress(json.dumps(data).encode("utf-8")))
+
+    with patch("parse_data.writeData2CSV") as mock_write:
+        parse_data.parse_comp_standings(json_path, csv_path, "Premier")
+        parse_data.parse_league_details(json_path, csv_path)
+
+    assert mock_write.call_args_list[0].kwargs["row_data"][0].TEAM_NAME == "Chelsea"
+    assert len(mock_write.call_args_list[1].kwargs["row_data"]) == 1
+
+
+def test_parse_team_details_reads_json_once(fake_paths):
+    '''Both team CSVs come from a single read of the team details file.'''
+    json_path, csv_path = fake_paths
+    with open(os.path.join(json_path, "ChelseaTeamDetails.json"), "w") as f:
+        json.dump({"id": 61, "name": "Chelsea", "squad": [{"id": 10, "name": "Player A"}]}, f)
+
+    with patch("parse_data.open_raw_text", wraps=parse_data.open_raw_text) as mock_open, \
+         patch("parse_data.writeData2CSV") as mock_write:
+        parse_data.parse_team_details(json_path, csv_path)
+
+    assert mock_open.call_count == 1
+    rows = {c.kwargs["file_name"]: c.kwargs["row_data"] for c in mock_write.call_args_list}
+    assert rows["ChelseaTeamDetails.csv"][0].TEAM_ID == 61
+    assert rows["ChelseaPlayers.csv"][0].PLAYER_NAME == "Player A"
+
+
+def test_parse_matches_streaming_writes_same_csv(fake_paths, tmp_path):
+    '''Streaming mode produces the same CSV as a full load.'''
+    json_path, csv_path = fake_paths
+    matches = [{"id": i, "homeTeam": {"name": "Chelsea"}, "referees": [{"name": "Ref"}]} for i in range(50)]
+    with open(os.path.join(json_path, "ChelseaMatches.json"), "w") as f:
+        json.dump({"filters": {}, "matches": matches}, f)
+    stream_dir = tmp_path / "stream_csv"
+    stream_dir.mkdir()
+
+    parse_data.parse_matches(json_path, csv_path, stream=False)
+    parse_data.parse_matches(json_path, str(stream_dir), stream=True)
+
+    with open(os.path.join(csv_path, "ChelseaMatches.csv")) as full, open(stream_dir / "ChelseaMatches.csv") as streamed:
+        assert full.read() == streamed.read()
+
+
+def test_parse_team_details_writes_parquet(fake_paths, monkeypatch):
+    '''PARSE_OUTPUT_FORMAT=parquet writes typed Parquet files instead of CSVs.'''
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setenv("PARSE_OUTPUT_FORMAT", "parquet")
+    json_path, csv_path = fake_paths
+    with open(os.path.join(json_path, "ChelseaTeamDetails.json"), "w") as f:
+        json.dump({"id": 61, "name": "Chelsea", "founded": 1905,
+                   "squad": [{"id": 10, "name": "Player A", "dateOfBirth": "2000-01-31"}]}, f)
+
+    parse_data.parse_team_details(json_path, csv_path)
+
+    assert sorted(os.listdir(csv_path)) == ["ChelseaPlayers.parquet", "ChelseaTeamDetails.parquet"]
+    players = pq.read_table(os.path.join(csv_path, "ChelseaPlayers.parquet")).to_pylist()
+    assert players[0]["player_id"] == 10
+    assert str(players[0]["player_dob"]) == "2000-01-31"
+
+
+def test_parse_matches_quarantines_bad_rows(fake_paths):
+    '''Rows that would fail COPY are written to a quarantine file instead of the table.'''
+    json_path, csv_path = fake_paths
+    matches = [
+        {"id": 1, "score": {"fullTime": {"home": 2, "away": 0}}},
+        {"id": 2, "score": {"fullTime": {"home": "two", "away": 0}}},
+        {"id": 1, "utcDate": "2024-08-18T15:30:00Z"},
+        {"utcDate": "2024-08-18"},
+        {"id": 3, "utcDate": "18/08/2024"},
+    ]
+    with open(os.path.join(json_path, "ChelseaMatches.json"), "w") as f:
+        json.dump({"matches": matches}, f)
+
+    for stream in (False, True):
+        parse_data.parse_matches(json_path, csv_path, stream=stream)
+
+        with open(os.path.join(csv_path, "ChelseaMatches.csv")) as f:
+            assert [row["MATCH_ID"] for row in csv.DictReader(f)] == ["1"]
+        with open(os.path.join(csv_path, "quarantine", "ChelseaMatches.quarantine.csv")) as f:
+            reasons = [row["QUARANTINE_REASON"] for row in csv.DictReader(f)]
+        assert reasons == ["fulltime_home: 'two' is not a valid INT", "duplicate primary key 1",
+                           "primary key (match_id) is null", "match_date: '18/08/2024' is not a valid DATE"]
+
+    with open(os.path.join(json_path, "ChelseaMatches.json"), "w") as f:
+        json.dump({"matches": matches[:1]}, f)
+    parse_data.parse_matches(json_path, csv_path)
+    assert not os.path.exists(os.path.join(csv_path, "quarantine", "ChelseaMatches.quarantine.csv"))
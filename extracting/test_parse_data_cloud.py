@@ -0,0 +1,78 @@
+import json
+
+import boto3
+import pytest
+from moto import mock_aws
+
+import parse_data_cloud
+from aws_clients import reset_s3_client
+
+
+@pytest.fixture(autouse=True)
+def s3_bucket(monkeypatch):
+    """A mocked bucket for every test."""
+    monkeypatch.setenv("AWS_ACCESS_KEY", "fake_access")
+    monkeypatch.setenv("AWS_SECRET_KEY", "fake_secret")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    reset_s3_client()
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="bkt-test")
+        yield s3
+    reset_s3_client()
+
+
+def test_parse_team_details_s3_quarantines_bad_players(s3_bucket):
+    team = {"id": 61, "name": "Chelsea", "squad": [{"id": 10, "name": "A"}, {"id": 10, "name": "B"}, {"name": "C"}]}
+    s3_bucket.put_object(Bucket="bkt-test", Key="json_files/ChelseaTeamDetails.json", Body=json.dumps(team))
+
+    tables = parse_data_cloud.parse_team_details_s3("bkt-test", upload=False)
+
+    spec, players = tables["csv_files/ChelseaPlayers.csv"]
+    assert [p.PLAYER_NAME for p in players] == ["A"]
+    body = s3_bucket.get_object(Bucket="bkt-test", Key="csv_files/quarantine/ChelseaPlayers.quarantine.csv")
+    lines = body["Body"].read().decode("utf-8").splitlines()
+    assert lines[0].endswith(",QUARANTINE_REASON")
+    assert [line.rsplit(",", 1)[1] for line in lines[1:]] == ["duplicate primary key 10",
+                                                             "primary key (player_id) is null"]
+    keys = [obj["Key"] for obj in s3_bucket.list_objects_v2(Bucket="bkt-test")["Contents"]]
+    assert "csv_files/ChelseaPlayers.csv" not in keys
+
+
+def test_parse_team_details_s3_deletes_stale_quarantine(s3_bucket):
+    s3_bucket.put_object(Bucket="bkt-test", Key="csv_files/quarantine/ChelseaPlayers.quarantine.csv", Body="old")
+    team = {"id": 61, "name": "Chelsea", "squad": [{"id": 10, "name": "A"}]}
+    s3_bucket.put_object(Bucket="bkt-test", Key="json_files/ChelseaTeamDetails.json", Body=json.dumps(team))
+
+    parse_data_cloud.parse_team_details_s3("bkt-test", upload=False)
+
+    keys = [obj["Key"] for obj in s3_bucket.list_objects_v2(Bucket="bkt-test")["Contents"]]
+    assert not any(key.startswith("csv_files/quarantine/") for key in keys)
+
+
+def test_download_json_from_s3_reads_whichever_variant_is_stored(s3_bucket, monkeypatch):
+    """The stored variant is looked up in the bucket rather than guessed from RAW_COMPRESSION."""
+    import gzip
+
+    monkeypatch.setenv("RAW_COMPRESSION", "none")
+    s3_bucket.put_object(Bucket="bkt-test", Key="json_files/data.json.gz", Body=gzip.compress(b'{"new": true}'))
+
+    assert parse_data_cloud.download_json_from_s3("bkt-test", "json_files/data.json") == {"new": True}
+    with pytest.raises(FileNotFoundError):
+        parse_data_cloud.download_json_from_s3("bkt-test", "json_files/missing.json")
+
+
+def test_parse_matches_s3_streams_the_same_rows(s3_bucket):
+    import gzip
+
+    matches = {"matches": [{"id": i, "utcDate": "2024-10-10", "homeTeam": {"name": "Chelsea"},
+                            "season": {"id": 5}, "competition": {"id": 123}} for i in (1, 2)]}
+    s3_bucket.put_object(Bucket="bkt-test", Key="json_files/ChelseaMatches.json.gz",
+                         Body=gzip.compress(json.dumps(matches).encode("utf-8")))
+
+    streamed = parse_data_cloud.parse_matches_s3("bkt-test", upload=False, stream=True)
+    loaded = parse_data_cloud.parse_matches_s3("bkt-test", upload=False, stream=False)
+
+    spec, rows = streamed["csv_files/ChelseaMatches.csv"]
+    assert [row.MATCH_ID for row in rows] == [1, 2]
+    assert list(rows) == list(loaded["csv_files/ChelseaMatches.csv"][1])
@@ -0,0 +1,40 @@
+import gzip
+
+import parse_manifest
+
+
+def test_input_digests_hash_stored_variant_and_mark_missing(tmp_path):
+    (tmp_path / "A.json").write_text('{"a": 1}')
+    (tmp_path / "B.json.gz").write_bytes(gzip.compress(b'{"b": 2}'))
+
+    digests = parse_manifest.input_digests(str(tmp_path), ["A.json", "B.json", "C.json"])
+
+    assert digests["A.json"] == parse_manifest.file_digest(str(tmp_path / "A.json"))
+    assert digests["B.json"] == parse_manifest.file_digest(str(tmp_path / "B.json.gz"))
+    assert digests["C.json"] is None
+
+
+def test_stage_is_current_until_inputs_or_outputs_change(tmp_path):
+    (tmp_path / "Out.csv").write_text("a\n1\n")
+    manifest = {}
+    digests = {"A.json": "abc"}
+
+    assert not parse_manifest.stage_is_current(manifest, "stage", digests, str(tmp_path))
+
+    parse_manifest.record_stage(manifest, "stage", digests, str(tmp_path), ["Out.csv"])
+    parse_manifest.save_manifest(manifest, str(tmp_path))
+    manifest = parse_manifest.load_manifest(str(tmp_path))
+
+    assert parse_manifest.stage_is_current(manifest, "stage", digests, str(tmp_path))
+    assert not parse_manifest.stage_is_current(manifest, "stage", {"A.json": "def"}, str(tmp_path))
+    assert not parse_manifest.stage_is_current(manifest, "other", digests, str(tmp_path))
+
+    (tmp_path / "Out.csv").write_text("a\n1\n2\n")
+    assert not parse_manifest.stage_is_current(manifest, "stage", digests, str(tmp_path))
+
+
+def test_missing_input_is_never_current(tmp_path):
+    manifest = {"stage": {"inputs": {"A.json": None}, "outputs": {}}}
+
+    assert not parse_manifest.stage_is_current(manifest, "stage", {"A.json": None}, str(tmp_path))
+    assert parse_manifest.load_manifest(str(tmp_path / "missing")) == {}
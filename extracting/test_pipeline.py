@@ -1,3 +1,4 @@
+import os
 import pytest
 from unittest.mock import patch
 
@@ -17,7 +18,9 @@ def test_run_full_cloud_pipeline_calls_all_functions():
          patch("pipeline.parse_team_details_s3") as mock_parse_team, \
          patch("pipeline.parse_league_details_s3") as mock_parse_league, \
          patch("pipeline.parse_comp_standings_s3") as mock_parse_standings, \
-         patch("pipeline.insert_data_to_db_from_s3") as mock_insert:
+         patch("pipeline.insert_data_to_db_from_s3") as mock_insert, \
+         patch("pipeline.load_validators_s3", return_value={}), \
+         patch("pipeline.save_validators_s3") as mock_save:
         
         import pipeline
         pipeline.run_full_cloud_pipeline()
@@ -35,6 +38,213 @@ def test_run_full_cloud_pipeline_calls_all_functions():
         assert mock_parse_standings.call_count == 2
 
         mock_insert.assert_called_once()
+        mock_save.assert_called_once()
+
+
+def test_run_full_cloud_pipeline_skips_unchanged_datasets():
+    """Only parse stages whose inputs changed run, and nothing loads if nothing changed."""
+    def ingest(url, key, bucket_name, api_name, s3_filename, validators):
+        return s3_filename == "json_files/ChelseaMatches.json"
+
+    with patch("pipeline.ingest_data_to_s3", side_effect=ingest), \
+         patch("pipeline.parse_matches_s3") as mock_parse_matches, \
+         patch("pipeline.parse_team_details_s3") as mock_parse_team, \
+         patch("pipeline.parse_league_details_s3") as mock_parse_league, \
+         patch("pipeline.parse_comp_standings_s3") as mock_parse_standings, \
+         patch("pipeline.insert_data_to_db_from_s3") as mock_insert, \
+         patch("pipeline.load_validators_s3", return_value={}), \
+         patch("pipeline.save_validators_s3"):
+
+        import pipeline
+        pipeline.run_full_cloud_pipeline()
+
+        mock_parse_matches.assert_called_once()
+        mock_parse_team.assert_not_called()
+        mock_parse_league.assert_not_called()
+        mock_parse_standings.assert_not_called()
+        mock_insert.assert_called_once()
+
+
+def test_run_full_cloud_pipeline_reports_all_parse_failures():
+    """Every parse stage runs even if others fail, and a failure stops the load."""
+    from helperFunction import StageError
+
+    with patch("pipeline.ingest_data_to_s3"), \
+         patch("pipeline.parse_matches_s3", side_effect=ValueError("bad matches")), \
+         patch("pipeline.parse_team_details_s3", side_effect=KeyError("squad")), \
+         patch("pipeline.parse_league_details_s3") as mock_parse_league, \
+         patch("pipeline.parse_comp_standings_s3") as mock_parse_standings, \
+         patch("pipeline.insert_data_to_db_from_s3") as mock_insert, \
+         patch("pipeline.load_validators_s3", return_value={}), \
+         patch("pipeline.save_validators_s3") as mock_save:
+
+        import pipeline
+        with pytest.raises(StageError) as excinfo:
+            pipeline.run_full_cloud_pipeline()
+
+    assert set(excinfo.value.errors) == {"parse json_files/ChelseaMatches.json",
+                                         "parse json_files/ChelseaTeamDetails.json"}
+    mock_parse_league.assert_called_once()
+    assert mock_parse_standings.call_count == 2
+    mock_insert.assert_not_called()
+    mock_save.assert_not_called()
+
+
+def test_run_full_cloud_pipeline_fails_if_spec_drops_a_parse_input(tmp_path, monkeypatch):
+    """A spec that no longer fetches a file a parse stage reads fails before fetching or loading anything."""
+    import json
+    spec_file = tmp_path / "jobs.json"
+    spec_file.write_text(json.dumps({"seasons": [2024], "teams": [{"id": 61, "name": "Chelsea"}]}))
+    monkeypatch.setenv("JOB_SPEC", str(spec_file))
+
+    with patch("pipeline.ingest_data_to_s3") as mock_ingest, \
+         patch("pipeline.insert_data_to_db_from_s3") as mock_insert, \
+         patch("pipeline.load_validators_s3", return_value={}), \
+         patch("pipeline.save_validators_s3") as mock_save:
+
+        import pipeline
+        with pytest.raises(ValueError, match="json_files/ChelseaMatches.json"):
+            pipeline.run_full_cloud_pipeline()
+
+    mock_ingest.assert_not_called()
+    mock_insert.assert_not_called()
+    mock_save.assert_not_called()
+
+
+def test_run_full_local_pipeline_parses_in_processes(tmp_path, monkeypatch):
+    """The local parse stages run in worker processes and write every output file."""
+    import json
+    import pipeline_local
+
+    json_dir = tmp_path / "json_files"
+    csv_dir = tmp_path / "csv_files"
+    json_dir.mkdir()
+    csv_dir.mkdir()
+    (json_dir / "ChelseaMatches.json").write_text(json.dumps({"matches": [{"id": 1}]}))
+    (json_dir / "ChelseaTeamDetails.json").write_text(json.dumps({"id": 61, "squad": [{"id": 10}]}))
+    for league in ("Premier", "Champions"):
+        (json_dir / f"{league}LeagueStandings.json").write_text(
+            json.dumps({"competition": {"id": 1}, "standings": [{"table": [{"position": 1}]}]}))
+    monkeypatch.setattr(pipeline_local, "__file__", str(tmp_path / "extracting" / "pipeline_local.py"))
+    monkeypatch.setenv("PARSE_WORKERS", "2")
+
+    with patch("pipeline_local.ingest_data", return_value=True), \
+         patch("pipeline_local.insert_data_to_db") as mock_insert:
+        pipeline_local.run_full_local_pipeline()
+
+    assert sorted(f for f in os.listdir(csv_dir) if f.endswith(".csv")) == [
+        "ChampionsLeagueStandings.csv", "ChelseaMatches.csv", "ChelseaPlayers.csv",
+        "ChelseaTeamDetails.csv", "CompetitionDetails.csv", "PremierLeagueStandings.csv"]
+    assert sorted(mock_insert.call_args.kwargs["tables"]) == sorted(
+        f for f in os.listdir(csv_dir) if f.endswith(".csv"))
+
+
+def test_run_full_local_pipeline_skips_stages_with_unchanged_inputs(tmp_path, monkeypatch):
+    """The parse manifest skips stages whose input bytes are unchanged and loads only rewritten tables."""
+    import json
+    import pipeline_local
+
+    json_dir = tmp_path / "json_files"
+    csv_dir = tmp_path / "csv_files"
+    json_dir.mkdir()
+    csv_dir.mkdir()
+    (json_dir / "ChelseaMatches.json").write_text(json.dumps({"matches": [{"id": 1}]}))
+    (json_dir / "ChelseaTeamDetails.json").write_text(json.dumps({"id": 61, "squad": [{"id": 10}]}))
+    for league in ("Premier", "Champions"):
+        (json_dir / f"{league}LeagueStandings.json").write_text(
+            json.dumps({"competition": {"id": 1}, "standings": [{"table": [{"position": 1}]}]}))
+    monkeypatch.setattr(pipeline_local, "__file__", str(tmp_path / "extracting" / "pipeline_local.py"))
+    monkeypatch.setenv("PARSE_WORKERS", "1")
+
+    with patch("pipeline_local.ingest_data", return_value=True), \
+         patch("pipeline_local.insert_data_to_db") as mock_insert:
+        pipeline_local.run_full_local_pipeline()
+        assert len(mock_insert.call_args.kwargs["tables"]) == 6
+
+        mock_insert.reset_mock()
+        pipeline_local.run_full_local_pipeline()
+        mock_insert.assert_not_called()
+
+        (json_dir / "ChelseaMatches.json").write_text(json.dumps({"matches": [{"id": 1}, {"id": 2}]}))
+        (csv_dir / "ChelseaPlayers.csv").unlink()
+        pipeline_local.run_full_local_pipeline()
+        assert sorted(mock_insert.call_args.kwargs["tables"]) == [
+            "ChelseaMatches.csv", "ChelseaPlayers.csv", "ChelseaTeamDetails.csv"]
+
+    assert (csv_dir / "ChelseaMatches.csv").read_text().count("\n") == 3
+
+
+def test_run_full_local_pipeline_fails_if_spec_drops_a_parse_input(tmp_path, monkeypatch):
+    """Locally too, a spec that stops fetching a parsed file fails instead of parsing the stale copy."""
+    import json
+    import pipeline_local
+
+    spec_file = tmp_path / "jobs.json"
+    spec_file.write_text(json.dumps({"seasons": [2024], "teams": [{"id": 61, "name": "Chelsea"}]}))
+    monkeypatch.setenv("JOB_SPEC", str(spec_file))
+    monkeypatch.setattr(pipeline_local, "__file__", str(tmp_path / "extracting" / "pipeline_local.py"))
+
+    with patch("pipeline_local.ingest_data") as mock_ingest, \
+         patch("pipeline_local.insert_data_to_db") as mock_insert:
+        with pytest.raises(ValueError, match="ChelseaMatches.json"):
+            pipeline_local.run_full_local_pipeline()
+
+    mock_ingest.assert_not_called()
+    mock_insert.assert_not_called()
+
+
+def test_run_full_cloud_pipeline_direct_load(monkeypatch):
+    """In direct mode parsed tables are COPYed from memory and written to S3 on the side."""
+    monkeypatch.setenv("DIRECT_LOAD", "true")
+    matches = {"csv_files/ChelseaMatches.csv": ("MATCHES", [{"MATCH_ID": 1}])}
+    team = {"csv_files/ChelseaTeamDetails.csv": ("TEAM", []), "csv_files/ChelseaPlayers.csv": ("PLAYERS", [])}
+
+    def ingest(url, key, bucket_name, api_name, s3_filename, validators):
+        return s3_filename in ("json_files/ChelseaMatches.json", "json_files/ChelseaTeamDetails.json")
+
+    with patch("pipeline.ingest_data_to_s3", side_effect=ingest), \
+         patch("pipeline.parse_matches_s3", return_value=matches) as mock_parse_matches, \
+         patch("pipeline.parse_team_details_s3", return_value=team), \
+         patch("pipeline.parse_league_details_s3") as mock_parse_league, \
+         patch("pipeline.upload_rows_to_s3") as mock_upload, \
+         patch("pipeline.insert_tables_to_db") as mock_insert_tables, \
+         patch("pipeline.insert_data_to_db_from_s3") as mock_insert, \
+         patch("pipeline.load_validators_s3", return_value={}), \
+         patch("pipeline.save_validators_s3") as mock_save:
+
+        import pipeline
+        pipeline.run_full_cloud_pipeline()
+
+    mock_parse_matches.assert_called_once_with("test-bucket", upload=False)
+    mock_parse_league.assert_not_called()
+    mock_insert_tables.assert_called_once_with({**matches, **team})
+    mock_insert.assert_not_called()
+    assert sorted(c.args[3] for c in mock_upload.call_args_list) == sorted([*matches, *team])
+    mock_save.assert_called_once()
+
+
+def test_load_parsed_tables_waits_for_side_writes():
+    """A failed S3 side-write is reported once the database load has finished."""
+    import pipeline
+    from helperFunction import StageError
+
+    tables = {"csv_files/ChelseaMatches.csv": ("MATCHES", []), "csv_files/ChelseaPlayers.csv": ("PLAYERS", [])}
+
+    def upload(spec, rows, bucket_name, s3_filename):
+        if spec == "PLAYERS":
+            raise IOError("S3 down")
+
+    with patch("pipeline.upload_rows_to_s3", side_effect=upload), \
+         patch("pipeline.insert_tables_to_db") as mock_insert_tables:
+        with pytest.raises(StageError) as excinfo:
+            pipeline.load_parsed_tables(tables, "test-bucket")
+
+    mock_insert_tables.assert_called_once_with(tables)
+    assert set(excinfo.value.errors) == {"csv_files/ChelseaPlayers.csv"}
+
+    with patch("pipeline.upload_rows_to_s3") as mock_upload, patch("pipeline.insert_tables_to_db"):
+        pipeline.load_parsed_tables(tables, "test-bucket", persist=False)
+    mock_upload.assert_not_called()
 
 
 def test_lambda_handler_success(monkeypatch):
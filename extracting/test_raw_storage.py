@@ -0,0 +1,80 @@
+import gzip
+import io
+import os
+import time
+import pytest
+
+import raw_storage
+
+
+def test_stored_name_follows_env(monkeypatch):
+    """RAW_COMPRESSION picks the suffix files are written with."""
+    monkeypatch.setenv("RAW_COMPRESSION", "gzip")
+    assert raw_storage.stored_name("ChelseaMatches.json") == "ChelseaMatches.json.gz"
+    assert raw_storage.logical_name("json_files/ChelseaMatches.json.gz") == "json_files/ChelseaMatches.json"
+
+
+def test_unknown_compression_raises():
+    with pytest.raises(ValueError, match="Unknown raw compression"):
+        raw_storage.raw_compression("lz4")
+
+
+def test_gzip_round_trip(tmp_path):
+    """Bytes written through compressing_writer read back as text unchanged."""
+    path = tmp_path / "data.json.gz"
+    with open(path, "wb") as f, raw_storage.compressing_writer(f, "gzip") as writer:
+        writer.write(b'{"foo": "bar"}')
+
+    assert path.read_bytes().startswith(raw_storage.GZIP_MAGIC)
+    with raw_storage.open_raw_text(str(path)) as f:
+        assert f.read() == '{"foo": "bar"}'
+    assert raw_storage.decompress_bytes(path.read_bytes()) == b'{"foo": "bar"}'
+
+
+def test_open_raw_stream_decodes_a_binary_stream():
+    """A compressed S3 body is decoded as it is read, like a local file."""
+    with raw_storage.open_raw_stream(io.BytesIO(gzip.compress(b'{"foo": "bar"}'))) as f:
+        assert f.read() == '{"foo": "bar"}'
+    with raw_storage.open_raw_stream(io.BytesIO(b'{"foo": "bar"}')) as f:
+        assert f.read() == '{"foo": "bar"}'
+
+
+def test_zstd_round_trip(tmp_path):
+    pytest.importorskip("zstandard")
+    path = tmp_path / "data.json.zst"
+    with open(path, "wb") as f, raw_storage.compressing_writer(f, "zstd") as writer:
+        writer.write(b'{"foo": "bar"}')
+
+    with raw_storage.open_raw_text(str(path)) as f:
+        assert f.read() == '{"foo": "bar"}'
+
+
+def test_find_raw_file_prefers_newest_variant(tmp_path):
+    """After switching format the freshly written variant is the one read."""
+    plain = tmp_path / "data.json"
+    plain.write_text('{"old": true}')
+    old = time.time() - 60
+    os.utime(plain, (old, old))
+    (tmp_path / "data.json.gz").write_bytes(gzip.compress(b'{"new": true}'))
+
+    assert raw_storage.find_raw_file(str(tmp_path), "data.json").endswith("data.json.gz")
+    with pytest.raises(FileNotFoundError):
+        raw_storage.find_raw_file(str(tmp_path), "missing.json")
+
+
+def test_find_raw_object_prefers_newest_variant():
+    """In S3 the newest variant by LastModified wins, whatever RAW_COMPRESSION now says."""
+    from datetime import datetime, timezone
+    from unittest.mock import MagicMock
+
+    s3_client = MagicMock()
+    s3_client.list_objects_v2.return_value = {"Contents": [
+        {"Key": "json_files/data.json", "LastModified": datetime(2026, 10, 1, tzinfo=timezone.utc)},
+        {"Key": "json_files/data.json.gz", "LastModified": datetime(2026, 10, 2, tzinfo=timezone.utc)},
+        {"Key": "json_files/data.json.bak", "LastModified": datetime(2026, 10, 3, tzinfo=timezone.utc)},
+    ]}
+
+    assert raw_storage.find_raw_object(s3_client, "bkt", "json_files/data.json") == "json_files/data.json.gz"
+    s3_client.list_objects_v2.assert_called_once_with(Bucket="bkt", Prefix="json_files/data.json")
+    s3_client.list_objects_v2.return_value = {}
+    assert raw_storage.find_raw_object(s3_client, "bkt", "json_files/data.json") is None
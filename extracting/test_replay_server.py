@@ -0,0 +1,51 @@
+import json
+import pytest
+
+import extract_data
+from helperFunction import resetRateLimiter
+from replay_server import ReplayServer
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limiter():
+    resetRateLimiter()
+    yield
+    resetRateLimiter()
+
+
+@pytest.fixture
+def fixtures_dir(tmp_path):
+    fixtures = tmp_path / "fixtures"
+    fixtures.mkdir()
+    (fixtures / "Team.json").write_text(json.dumps({"id": 61, "name": "Chelsea FC"}))
+    return fixtures
+
+
+def test_replay_server_serves_fixture_to_ingest_data(fixtures_dir, tmp_path):
+    """extract_data can target the replay server and gets the recorded payload."""
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    with ReplayServer(str(fixtures_dir), routes={"v4/teams/61": "Team.json"}) as server:
+        extract_data.ingest_data(server.url, "key", str(out_dir), "v4/teams/61", "Team.json")
+
+    assert json.loads((out_dir / "Team.json").read_text()) == {"id": 61, "name": "Chelsea FC"}
+
+
+def test_replay_server_injected_errors_are_retried(fixtures_dir, tmp_path):
+    """Injected 500 and 429 responses are served first, then the fixture."""
+    with ReplayServer(str(fixtures_dir), routes={"v4/teams/61": "Team.json"},
+                      errors=[500, 429], retry_after=0) as server:
+        changed = extract_data.ingest_data(server.url, "key", str(tmp_path), "v4/teams/61", "Team.json")
+        assert server.attempts == {"v4/teams/61": 3}
+
+    assert changed is True
+
+
+def test_replay_server_answers_conditional_requests(fixtures_dir, tmp_path):
+    """A repeated request with the stored ETag gets a 304."""
+    validators = {}
+    with ReplayServer(str(fixtures_dir), routes={"v4/teams/61": "Team.json"}) as server:
+        first = extract_data.ingest_data(server.url, "key", str(tmp_path), "v4/teams/61", "Team.json", validators)
+        second = extract_data.ingest_data(server.url, "key", str(tmp_path), "v4/teams/61", "Team.json", validators)
+
+    assert (first, second) == (True, False)
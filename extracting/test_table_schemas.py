@@ -0,0 +1,48 @@
+import os
+import re
+
+import table_schemas
+
+SCHEMA_SQL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "schema.sql")
+
+
+def parse_schema_sql():
+    """Return {table: ([(column, type)], [primary key columns])} from database/schema.sql."""
+    with open(SCHEMA_SQL, encoding="utf-8") as f:
+        sql = f.read()
+    tables = {}
+    for name, body in re.findall(r"CREATE TABLE (\w+) \((.*?)\n\);", sql, flags=re.S):
+        columns, primary_key = [], []
+        for line in body.strip().splitlines():
+            line = line.strip().rstrip(",")
+            if not line:
+                continue
+            composite = re.match(r"PRIMARY KEY \((.*)\)", line)
+            if composite:
+                primary_key = [c.strip() for c in composite.group(1).split(",")]
+                continue
+            column, col_type = line.split()[:2]
+            columns.append((column, col_type))
+            if "PRIMARY KEY" in line:
+                primary_key = [column]
+        tables[name] = (columns, primary_key)
+    return tables
+
+
+def test_columns_and_keys_match_schema_sql():
+    tables = parse_schema_sql()
+
+    assert set(tables) == set(table_schemas.COLUMNS)
+    for table, (columns, primary_key) in tables.items():
+        assert table_schemas.COLUMNS[table] == columns, table
+        assert table_schemas.PRIMARY_KEYS[table] == primary_key, table
+
+
+def test_output_columns_match_table_columns():
+    """Every parser's columns line up with its table's, in order."""
+    from field_mapping import COMPETITION_DETAILS, MATCHES, PLAYERS, STANDINGS, TEAM_DETAILS
+
+    for spec in (MATCHES, TEAM_DETAILS, PLAYERS, COMPETITION_DETAILS):
+        table = table_schemas.table_for_file(spec.file_name)
+        assert [c.lower() for c in spec.col_names] == [c for c, _ in table_schemas.COLUMNS[table]]
+    assert [c.lower() for c in STANDINGS.col_names] == [c for c, _ in table_schemas.COLUMNS["premier_league_standings"]]
@@ -0,0 +1,55 @@
+from field_mapping import PLAYERS, STANDINGS
+from validation import quarantine_name, validate_rows
+
+
+def player(player_id, dob=None, name="A"):
+    return PLAYERS.row_type(player_id, name, None, dob, None)
+
+
+def test_validate_rows_checks_types_column_by_column():
+    rows = [player(1, "2000-01-31"), player("2", "2000-02-30"), player(2 ** 31), player(True),
+            player("+3"), player(4, name={"first": "A"})]
+    quarantine = []
+
+    valid = validate_rows(PLAYERS.file_name, PLAYERS.col_names, rows, quarantine)
+
+    assert valid == [rows[0], rows[4], rows[5]]
+    assert [reason for _, reason in quarantine] == [
+        "player_dob: '2000-02-30' is not a valid DATE",
+        "player_id: 2147483648 is not a valid INT",
+        "player_id: True is not a valid INT",
+    ]
+
+
+def test_validate_rows_checks_columns_of_native_values():
+    """Columns of plain ints skip the per-value checks but still catch bad values; TEXT takes anything."""
+    rows = [player(i, name=f"Player {i}") for i in range(1, 5)] + [player(2 ** 31), player(5, name=5)]
+    quarantine = []
+
+    valid = validate_rows(PLAYERS.file_name, PLAYERS.col_names, rows, quarantine)
+
+    assert valid == rows[:4] + rows[5:]
+    assert [reason for _, reason in quarantine] == ["player_id: 2147483648 is not a valid INT"]
+
+
+def test_validate_rows_checks_composite_keys_across_batches():
+    def standing(position, team_id):
+        row = dict.fromkeys(STANDINGS.col_names)
+        row.update(POSITION=position, TEAM_ID=team_id)
+        return row
+
+    rows = [standing(1, 61), standing(2, 61), standing(1, 61), standing(3, None)]
+    quarantine = []
+
+    valid = validate_rows('csv_files/PremierLeagueStandings.csv', STANDINGS.col_names, iter(rows),
+                          quarantine, batch_size=2)
+
+    assert not isinstance(valid, list)
+    assert list(valid) == rows[:2]
+    assert [reason for _, reason in quarantine] == ["duplicate primary key (1, 61)",
+                                                    "primary key (position, team_id) is null"]
+    assert quarantine[0][0][:2] == [1, 61]
+
+
+def test_quarantine_name():
+    assert quarantine_name('csv_files/ChelseaMatches.csv') == 'ChelseaMatches.quarantine.csv'
@@ -0,0 +1,166 @@
+"""Check parsed rows against the table schemas before they are written.
+
+Rows are checked a batch at a time, column by column. TEXT takes any value.
+A column holding only its type's native Python values (int in range for INT
+and BIGINT, date for DATE) or None is cleared without looking at each value;
+otherwise each distinct value is run through the check for its Postgres type
+once. Primary keys are then checked for nulls and duplicates. Rows that would make COPY fail are set aside with the
+reason, to be written to a quarantine file, so one bad API record can no longer
+abort the load after the tables have been truncated.
+"""
+
+import os
+import re
+from datetime import date
+from itertools import islice
+
+from helperFunction import writeData2CSV
+from table_schemas import COLUMNS, PRIMARY_KEYS, table_for_file
+
+BATCH_SIZE = 10000
+QUARANTINE_DIR = "quarantine"
+REASON_COLUMN = "QUARANTINE_REASON"
+INTEGER = re.compile(r'[+-]?[0-9]+')
+
+
+def _is_integer(bits):
+    low, high = -2 ** (bits - 1), 2 ** (bits - 1)
+
+    def check(value):
+        if isinstance(value, str):
+            if not INTEGER.fullmatch(value.strip()):
+                return False
+            value = int(value)
+        elif type(value) is not int:
+            return False
+        return low <= value < high
+    return check
+
+
+def _is_date(value):
+    if isinstance(value, date):
+        return True
+    if not isinstance(value, str) or (len(value) > 10 and value[10] not in 'T '):
+        return False
+    try:
+        date.fromisoformat(value[:10])
+    except ValueError:
+        return False
+    return True
+
+
+def _is_text(value):
+    # COPY takes any value as text: the CSV and binary writers str() whatever is not a str,
+    # e.g. season.winner, which the API sends as an object once a season has finished
+    return True
+
+
+CHECKS = {'INT': _is_integer(32), 'BIGINT': _is_integer(64), 'DATE': _is_date, 'TEXT': _is_text}
+NATIVE_TYPES = {'INT': {int, type(None)}, 'BIGINT': {int, type(None)}, 'DATE': {date, type(None)}}
+INTEGER_RANGES = {'INT': (-2 ** 31, 2 ** 31), 'BIGINT': (-2 ** 63, 2 ** 63)}
+
+
+def _is_null(value):
+    return value is None or value == ''
+
+
+def _invalid(pg_type, column):
+    """Return the positions of column's values that are neither null nor valid for pg_type."""
+    if pg_type == 'TEXT':
+        return []
+    types = set(map(type, column))
+    if types <= NATIVE_TYPES[pg_type]:
+        if pg_type not in INTEGER_RANGES:
+            return []
+        low, high = INTEGER_RANGES[pg_type]
+        present = [value for value in column if value is not None]
+        if not present or (low <= min(present) and max(present) < high):
+            return []
+
+    check = CHECKS[pg_type]
+    if not all(t.__hash__ for t in types):
+        return [i for i, value in enumerate(column) if not _is_null(value) and not check(value)]
+    if len(types - {type(None)}) > 1:
+        # Keyed by type too, so True is not taken for 1
+        keys = [(type(value), value) for value in column]
+        valid = {key: _is_null(key[1]) or check(key[1]) for key in set(keys)}
+        return [i for i, key in enumerate(keys) if not valid[key]]
+    valid = {value: _is_null(value) or check(value) for value in set(column)}
+    return [i for i, value in enumerate(column) if not valid[value]]
+
+
+def validate_rows(file_name, col_names, rows, quarantine, batch_size=BATCH_SIZE):
+    """Return the rows of file_name's table that will load cleanly.
+
+    Rejected rows are appended to quarantine as (row, reason). A list of rows
+    gives back a list; any other iterable is validated lazily, a batch at a
+    time, so streamed rows stay streamed (quarantine then fills as it is read).
+    """
+    valid = _validate(file_name, col_names, rows, quarantine, batch_size)
+    return list(valid) if isinstance(rows, list) else valid
+
+
+def _validate(file_name, col_names, rows, quarantine, batch_size):
+    table = table_for_file(file_name)
+    columns = COLUMNS[table]
+    if len(columns) != len(col_names):
+        raise ValueError(f"{file_name} has {len(col_names)} columns, {table} expects {len(columns)}")
+    key_columns = [i for i, (name, _) in enumerate(columns) if name in PRIMARY_KEYS[table]]
+    seen_keys = set()
+
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        values = [[row.get(name) for name in col_names] if isinstance(row, dict) else row for row in batch]
+        column_values = list(zip(*values))
+        reasons = [None] * len(batch)
+
+        for (name, pg_type), column in zip(columns, column_values):
+            for i in _invalid(pg_type, column):
+                reasons[i] = reasons[i] or f"{name}: {column[i]!r} is not a valid {pg_type}"
+
+        for i, key in enumerate(zip(*(column_values[k] for k in key_columns))):
+            if reasons[i]:
+                continue
+            if None in key or '' in key:
+                reasons[i] = "primary key ({}) is null".format(", ".join(PRIMARY_KEYS[table]))
+            elif key in seen_keys:
+                reasons[i] = "duplicate primary key {}".format(key if len(key) > 1 else key[0])
+            else:
+                seen_keys.add(key)
+
+        if not any(reasons):
+            yield from batch
+            continue
+        for row, row_values, reason in zip(batch, values, reasons):
+            if reason:
+                quarantine.append((row_values, reason))
+            else:
+                yield row
+
+
+def quarantine_name(file_name):
+    """Return the quarantine file name for an output file, e.g. ChelseaMatches.quarantine.csv."""
+    return os.path.basename(file_name).rsplit('.', 1)[0] + '.quarantine.csv'
+
+
+def quarantine_rows(quarantine):
+    """Return quarantined (row, reason) pairs as rows with the reason as a last column."""
+    return [list(row) + [reason] for row, reason in quarantine]
+
+
+def write_quarantine(file_name, writePath, col_names, quarantine):
+    """Write rejected rows next to the parsed files, or remove a stale quarantine file if there are none."""
+    quarantine_path = os.path.join(writePath, QUARANTINE_DIR)
+    op_file = os.path.join(quarantine_path, quarantine_name(file_name))
+    if not quarantine:
+        if os.path.exists(op_file):
+            os.remove(op_file)
+        return
+
+    print(f"Quarantined {len(quarantine)} row(s) of {os.path.basename(file_name)}")
+    os.makedirs(quarantine_path, exist_ok=True)
+    writeData2CSV(file_name=quarantine_name(file_name), writePath=quarantine_path,
+                  col_names=list(col_names) + [REASON_COLUMN], row_data=quarantine_rows(quarantine))